@@ -0,0 +1,196 @@
+"""
+Bounded, TTL-aware cache for API responses.
+
+- Keys are SHA-256 digests of a namespace (by default the function's qualified name) and the call's arguments, so
+  they are stable across processes, including a script run as `__main__` and the same script imported by name.
+- Entries live in an in-process LRU of at most `maxsize` items and expire `ttl` seconds after they were stored.
+- With `path` set, entries are also written to a local SQLite file so they survive restarts. Hits served from
+  memory refresh the entry's access time on disk in batches, so the on-disk LRU keeps the hottest entries.
+- `cache_info()` reports hits, misses, evictions and expirations to confirm the cache reduces API load; hits and
+  misses are also recorded in the instrumentation metrics, labelled with the function's name.
+"""
+import functools
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import instrumentation
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions expirations currsize maxsize')
+
+_MISSING = object()
+
+# Memory hits whose on-disk access time is refreshed in one statement
+TOUCH_BATCH = 64
+
+
+def make_key(namespace, args, kwargs):
+    """
+    Stable hashed key for a call with `args` and `kwargs` in `namespace`.
+    """
+    payload = repr((namespace, args, sorted(kwargs.items())))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SQLiteBackend:
+    """
+    On-disk store for cache entries; values are pickled into a single SQLite table.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        row = self._conn.execute("SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return _MISSING, None
+        self._conn.execute("UPDATE cache_entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, key, value, expires_at):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), expires_at, time.time()),
+        )
+        self._conn.commit()
+
+    def touch(self, keys, accessed_at):
+        self._conn.executemany("UPDATE cache_entries SET accessed_at = ? WHERE key = ?",
+                               [(accessed_at, key) for key in keys])
+        self._conn.commit()
+
+    def delete(self, key):
+        self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+        self._conn.commit()
+
+    def evict(self, maxsize):
+        # Drop expired entries, then the least recently used ones beyond `maxsize`
+        cursor = self._conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        expired = cursor.rowcount
+        cursor = self._conn.execute(
+            "DELETE FROM cache_entries WHERE key NOT IN "
+            "(SELECT key FROM cache_entries ORDER BY accessed_at DESC LIMIT ?)",
+            (maxsize,),
+        )
+        self._conn.commit()
+        return expired, cursor.rowcount
+
+    def clear(self):
+        self._conn.execute("DELETE FROM cache_entries")
+        self._conn.commit()
+
+
+class ResponseCache:
+    def __init__(self, maxsize=128, ttl=None, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = SQLiteBackend(path) if path else None
+        self._entries = OrderedDict()
+        self._touched = set()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        """
+        Return the cached value for `key`, or the `_MISSING` sentinel.
+        """
+        with self._lock:
+            now = time.time()
+            value, expires_at = self._entries.get(key, (_MISSING, None))
+            if self.backend is not None:
+                if value is _MISSING:
+                    value, expires_at = self.backend.get(key)
+                    if value is not _MISSING:
+                        self._store(key, value, expires_at)
+                else:
+                    self._touched.add(key)
+                    if len(self._touched) >= TOUCH_BATCH:
+                        self._flush_touched()
+            if value is not _MISSING and expires_at is not None and expires_at <= now:
+                self._discard(key)
+                self.expirations += 1
+                value = _MISSING
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            expires_at = time.time() + self.ttl if self.ttl is not None else None
+            self._store(key, value, expires_at)
+            if self.backend is not None:
+                self.backend.set(key, value, expires_at)
+                # Record pending memory hits before the on-disk LRU picks what to evict
+                self._flush_touched()
+                expired, evicted = self.backend.evict(self.maxsize)
+                self.expirations += expired
+                self.evictions += evicted
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            if self.backend is None:
+                self.evictions += 1
+
+    def _flush_touched(self):
+        if self._touched:
+            self.backend.touch(self._touched, time.time())
+            self._touched.clear()
+
+    def _discard(self, key):
+        self._entries.pop(key, None)
+        self._touched.discard(key)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.evictions, self.expirations, len(self._entries), self.maxsize)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._touched.clear()
+            if self.backend is not None:
+                self.backend.clear()
+
+
+def cache(maxsize=128, ttl=None, path=None, namespace=None):
+    """
+    Decorator caching a function's results in a `ResponseCache`, keyed by `namespace` (default: the function's
+    qualified name, without its module) and the call's arguments.
+    The wrapper exposes `cache_info()`, `cache_clear()` and the underlying `cache`.
+    """
+    def decorator(func):
+        response_cache = ResponseCache(maxsize=maxsize, ttl=ttl, path=path)
+        key_namespace = namespace or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(key_namespace, args, kwargs)
+            result = response_cache.get(key)
+            instrumentation.count_cache(func.__qualname__, result is not _MISSING)
+            if result is _MISSING:
+                result = func(*args, **kwargs)
+                response_cache.set(key, result)
+            return result
+
+        wrapper.cache = response_cache
+        wrapper.cache_info = response_cache.info
+        wrapper.cache_clear = response_cache.clear
+        return wrapper
+
+    return decorator
@@ -0,0 +1,72 @@
+"""
+CSV loading through the columnar cache (columnar_cache.load_csv) versus pd.read_csv on an ICU extract: wall-clock
+and peak resident memory of each load, measured in a fresh process, for the first (converting) load, later loads of
+all columns and later loads of the model's columns only. Checks that the cached values match pd.read_csv.
+
+Usage:
+    python benchmarks/bench_columnar_cache.py [n_rows]
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import columnar_cache
+import synthetic_icu
+from bench_dqc_chunked import peak_memory
+from predict_sepsis import SepsisPredictor
+
+MODEL_COLUMNS = SepsisPredictor().selected_features + ['sepsis']
+SCHEMA = {feature: 'category' for feature in SepsisPredictor.categorical_features}
+
+def _cache_dir(path):
+    return os.path.join(os.path.dirname(path), 'cache')
+
+def run_read_csv(path):
+    return pd.read_csv(path)
+
+def run_read_csv_columns(path):
+    return pd.read_csv(path, usecols=MODEL_COLUMNS)
+
+def run_cached(path):
+    return columnar_cache.load_csv(path, schema=SCHEMA, cache_dir=_cache_dir(path))
+
+def run_cached_columns(path):
+    return columnar_cache.load_csv(path, columns=MODEL_COLUMNS, schema=SCHEMA, cache_dir=_cache_dir(path))
+
+def check_values(path):
+    expected = pd.read_csv(path, parse_dates=['timestamp'])
+    cached = run_cached(path)
+    assert list(cached.columns) == list(expected.columns)
+    for column in expected.columns:
+        values = cached[column].astype(object) if isinstance(cached[column].dtype, pd.CategoricalDtype) else cached[column]
+        np.testing.assert_array_equal(values.to_numpy(), expected[column].to_numpy())
+    return cached
+
+def main(n_rows=1_000_000):
+    directory = tempfile.mkdtemp()
+    path = synthetic_icu.write_dataset(os.path.join(directory, 'icu_patient_data.csv'), n_rows)
+    print(f"{n_rows} rows, {os.path.getsize(path) / 2 ** 20:.1f} MB CSV")
+
+    runs = [('pd.read_csv, all columns', run_read_csv),
+            ('load_csv, first load (converts)', run_cached),
+            ('load_csv, all columns', run_cached),
+            ('pd.read_csv, model columns', run_read_csv_columns),
+            ('load_csv, model columns', run_cached_columns)]
+    for label, func in runs:
+        seconds, peak = peak_memory(func, path)
+        print(f"{label:<32} {seconds:6.2f}s   peak RSS {peak / 2 ** 20:7.1f} MB")
+
+    cached = check_values(path)
+    cache_files = os.listdir(_cache_dir(path))
+    cache_mb = sum(os.path.getsize(os.path.join(_cache_dir(path), name)) for name in cache_files) / 2 ** 20
+    print(f"cached values match pd.read_csv; {cache_mb:.1f} MB cache, in-memory frame "
+          f"{cached.memory_usage(deep=True).sum() / 2 ** 20:.1f} MB vs "
+          f"{pd.read_csv(path).memory_usage(deep=True).sum() / 2 ** 20:.1f} MB")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
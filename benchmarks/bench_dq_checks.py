@@ -0,0 +1,57 @@
+"""
+Benchmark of the fused check engine in data_quality_control_fastapi.py against running the eight checks individually.
+
+Usage:
+    python benchmarks/bench_dq_checks.py [n_rows]
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_quality_control_fastapi as dq
+import synthetic_icu
+
+def upload_frame(n_rows):
+    # The data quality upload without missing values (the individual precision check raises on them)
+    return synthetic_icu.make_dataset('dq_upload.csv', n_rows, missing_rate=0)
+
+def variants(df):
+    # Frames on which individual checks pass and fail for different reasons
+    yield df
+    yield df.assign(date_column=df['date_column'] + (pd.Timestamp.now().normalize() - synthetic_icu.UPLOAD_DATE))
+    yield df[['col1', 'col2', 'col3']].assign(date_column=df['date_column'] - pd.Timedelta(days=60))
+    yield df.assign(col1=df['col1'] * 2)
+    yield df.assign(col2=df['col2'].round(2))
+    yield df.assign(col2=df['col2'] + 1e-4)
+    yield df.assign(col3=df['col3'] * 3)
+    yield pd.concat([df, df.iloc[:1]], ignore_index=True)
+
+def main(n_rows=10_000_000):
+    for variant in variants(upload_frame(10_000)):
+        expected = [bool(result) for result in dq.run_data_quality_checks_individually(variant)]
+        assert dq.run_data_quality_checks(variant) == expected, expected
+
+    df = upload_frame(n_rows)
+
+    start = time.perf_counter()
+    individual = dq.run_data_quality_checks_individually(df)
+    individual_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    verdicts, timings = dq.run_fused_checks(df)
+    fused_seconds = time.perf_counter() - start
+
+    assert [verdicts[name] for name in dq.CHECK_NAMES] == [bool(result) for result in individual]
+
+    print(f"rows:             {n_rows}")
+    print(f"individual:       {individual_seconds:.2f}s")
+    print(f"fused:            {fused_seconds:.2f}s ({individual_seconds / fused_seconds:.1f}x)")
+    for stage, seconds in timings.items():
+        print(f"  {stage:<14}  {seconds:.3f}s")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000)
@@ -0,0 +1,76 @@
+"""
+Benchmark of `dqc.profile_data` against the previous per-column loop of `dqc.main` on the synthetic ICU table
+(see synthetic_icu.py), widened with extra lab columns.
+
+Usage:
+    python benchmarks/bench_dqc.py [n_rows] [n_extra_columns]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dqc
+import synthetic_icu
+
+GROUP_COLUMNS = ['hospital_id', 'ward']
+
+def legacy_check_consistency(df, group_columns, check_column):
+    # `dqc.check_consistency` before it moved to a hash-based groupby-nunique
+    group_data = df.groupby(list(group_columns))[check_column].apply(list).reset_index()
+    return group_data.apply(lambda row: len(set(row[check_column])) > 1, axis=1).sum()
+
+def column_loop(df):
+    # The per-column loop `dqc.main` used before `profile_data`
+    results_dict = {}
+    for column in df.columns:
+        results_dict[column] = {
+            "Missing Values": dqc.check_missing_values(df[column]),
+            "Duplicates": dqc.check_duplicates(df[column]),
+            "High Cardinality": dqc.check_cardinality(df, column)[0],
+            "Low Cardinality": dqc.check_cardinality(df, column)[1],
+            "Consistency Issues": legacy_check_consistency(df, group_columns=df.drop(column, axis=1).columns[:2], check_column=column),
+        }
+        accuracy_count, accuracy_percent, validity_count, validity_percent = dqc.check_accuracy_validity(df, column)
+        results_dict[column]["Accuracy Count"] = accuracy_count
+        results_dict[column]["Accuracy Percentage"] = accuracy_percent
+        results_dict[column]["Validity Count"] = validity_count
+        results_dict[column]["Validity Percentage"] = validity_percent
+    return results_dict
+
+def main(n_rows=100_000, n_extra_columns=20):
+    # Read back from CSV, as dqc.py reads its input (the per-column checks expect plain string columns)
+    path = synthetic_icu.write_dataset(os.path.join(tempfile.mkdtemp(), 'Suicide data.csv'), n_rows,
+                                       n_extra_columns=n_extra_columns)
+    df = pd.read_csv(path)
+    check_columns = [column for column in df.columns if column not in GROUP_COLUMNS]
+
+    start = time.perf_counter()
+    groups = dqc.find_inconsistent_groups(df, GROUP_COLUMNS, check_columns)
+    consistency_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = column_loop(df)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = dqc.profile_data(df)
+    profile_seconds = time.perf_counter() - start
+
+    for column, fields in expected.items():
+        for field, value in fields.items():
+            assert np.isclose(results.at[column, field], value), (column, field, results.at[column, field], value)
+
+    print(f"data:         {n_rows} rows x {df.shape[1]} columns")
+    print(f"column loop:  {loop_seconds:.2f}s")
+    print(f"profile_data: {profile_seconds:.2f}s ({loop_seconds / profile_seconds:.1f}x)")
+    print(f"consistency:  {consistency_seconds:.2f}s for {len(check_columns)} columns in one pass, {len(groups)} offending groups")
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
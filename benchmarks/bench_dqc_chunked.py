@@ -0,0 +1,75 @@
+"""
+Chunked (out-of-core) dqc profiling: checks `dqc.profile_csv` against the in-memory `dqc.profile_data`
+and reports its peak resident memory, measured in a fresh process per run, as the CSV grows.
+
+Usage:
+    python benchmarks/bench_dqc_chunked.py [max_rows] [n_extra_columns]
+"""
+import os
+import sys
+import multiprocessing
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dqc
+import synthetic_icu
+
+def run_in_memory(path):
+    return dqc.profile_data(dqc.load_data(path))
+
+def run_chunked(path):
+    return dqc.profile_csv(path, chunksize=50_000)
+
+def peak_rss():
+    # High-water resident set size of this process in bytes (Linux)
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024
+
+def _measure(func, path, queue):
+    start = time.perf_counter()
+    func(path)
+    seconds = time.perf_counter() - start
+    queue.put((seconds, peak_rss()))
+
+def peak_memory(func, path):
+    # Run in a fresh interpreter so the peak RSS covers only this run
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(func, path, queue))
+    process.start()
+    seconds, peak = queue.get()
+    process.join()
+    return seconds, peak
+
+def main(max_rows=1_600_000, n_extra_columns=0):
+    directory = tempfile.mkdtemp()
+
+    path = synthetic_icu.write_dataset(os.path.join(directory, 'check.csv'), 50_000, 'Suicide data.csv',
+                                       n_extra_columns=n_extra_columns)
+    expected = dqc.profile_data(pd.read_csv(path))
+    exact = dqc.profile_csv(path, chunksize=7_000, distinct='exact')
+    approximate = dqc.profile_csv(path, chunksize=7_000, distinct='hll')
+    pd.testing.assert_frame_equal(exact, expected, check_dtype=False)
+    error = ((approximate["Distinct Values"] - expected["Distinct Values"]).abs() / expected["Distinct Values"]).max()
+    print(f"exact chunked profile matches in-memory profile; max HLL distinct-count error {error:.2%}")
+
+    n_rows = max_rows // 16
+    while n_rows <= max_rows:
+        path = synthetic_icu.write_dataset(os.path.join(directory, f"{n_rows}.csv"), n_rows, 'Suicide data.csv',
+                                           n_extra_columns=n_extra_columns)
+        size_mb = os.path.getsize(path) / 2 ** 20
+        in_memory_seconds, in_memory_peak = peak_memory(run_in_memory, path)
+        chunked_seconds, chunked_peak = peak_memory(run_chunked, path)
+        print(f"{n_rows:>9} rows ({size_mb:6.1f} MB): in-memory peak {in_memory_peak / 2 ** 20:6.1f} MB "
+              f"in {in_memory_seconds:.2f}s, chunked peak {chunked_peak / 2 ** 20:6.1f} MB in {chunked_seconds:.2f}s")
+        n_rows *= 2
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,43 @@
+"""
+Scaling of `dqc.profile_data` with the number of worker processes, on the synthetic ICU table (see synthetic_icu.py)
+widened with extra lab columns.
+
+Usage:
+    python benchmarks/bench_dqc_parallel.py [n_rows] [n_extra_columns]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dqc
+import synthetic_icu
+
+def main(n_rows=1_000_000, n_extra_columns=24):
+    path = synthetic_icu.write_dataset(os.path.join(tempfile.mkdtemp(), 'Suicide data.csv'), n_rows,
+                                       n_extra_columns=n_extra_columns)
+    df = pd.read_csv(path)
+
+    start = time.perf_counter()
+    expected = dqc.profile_data(df, n_jobs=1)
+    serial_seconds = time.perf_counter() - start
+    print(f"data:     {n_rows} rows x {df.shape[1]} columns")
+    print(f"1 job:    {serial_seconds:.2f}s")
+
+    n_jobs = 2
+    while n_jobs <= os.cpu_count():
+        start = time.perf_counter()
+        results = dqc.profile_data(df, n_jobs=n_jobs)
+        seconds = time.perf_counter() - start
+        pd.testing.assert_frame_equal(results, expected)
+        print(f"{n_jobs} jobs:   {seconds:.2f}s ({serial_seconds / seconds:.1f}x, "
+              f"{serial_seconds / seconds / n_jobs:.0%} efficiency)")
+        n_jobs *= 2
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
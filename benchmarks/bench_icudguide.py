@@ -0,0 +1,46 @@
+"""
+Benchmark of the batch protocol engine in icudguide.py against the scalar, one-dict-per-patient functions.
+
+Usage:
+    python benchmarks/bench_icudguide.py [n_patients]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import icudguide
+import synthetic_icu
+
+SCALAR_PROTOCOLS = {
+    'sepsis': icudguide.sepsis_protocol,
+    'shock': icudguide.shock_protocol,
+    'ventilator': icudguide.ventilator_protocol,
+    'pain_management': icudguide.pain_management_protocol,
+    'glycemic_control': icudguide.glycemic_control_protocol,
+}
+
+def main(n=100_000):
+    patients = synthetic_icu.make_icu_table(n)[icudguide.PROTOCOL_FIELDS]
+
+    start = time.perf_counter()
+    records = patients.to_dict('records')
+    scalar = {name: [func(record) for record in records] for name, func in SCALAR_PROTOCOLS.items()}
+    scalar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = icudguide.evaluate_protocols(patients)
+    batch_seconds = time.perf_counter() - start
+
+    messages = icudguide.protocol_messages(results)
+    for name in SCALAR_PROTOCOLS:
+        assert messages[name].tolist() == scalar[name], f"{name} differs from the scalar protocol"
+
+    print(f"patients:      {n}")
+    print(f"scalar loop:   {scalar_seconds:.3f}s ({n / scalar_seconds:,.0f} patients/s)")
+    print(f"batch engine:  {batch_seconds:.3f}s ({n / batch_seconds:,.0f} patients/s)")
+    print(f"speedup:       {scalar_seconds / batch_seconds:.1f}x")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
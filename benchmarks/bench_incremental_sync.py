@@ -0,0 +1,130 @@
+"""
+Hourly sync cost of a full refresh (fetch every page, re-read the whole CSV, deduplicate and replace the table)
+versus the incremental sync in incremental_sync.py (fetch records past the watermark, read the appended CSV lines,
+drop rows already loaded by hash and upsert the delta), as the history grows and the delta stays fixed.
+
+Runs against a local stub API and a SQLite file; set DATABASE_URL to use another warehouse.
+
+Usage:
+    python benchmarks/bench_incremental_sync.py [max_history] [delta]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_icu
+from api_client import iter_pages
+from incremental_sync import fetch_api_delta, get_watermark, merge_delta, new_rows, read_csv_delta, set_watermark
+from warehouse_loader import get_engine, load_dataframe
+
+PAGE_SIZE = 1_000
+
+def admissions(start, n):
+    # `n` admissions with ids from `start`, each one row of the synthetic ICU table, updated a second apart in id order
+    table = synthetic_icu.make_icu_table(max(n, 1), seed=start, rows_per_patient=1).head(n)
+    ids = np.arange(start, start + n)
+    return pd.DataFrame({
+        'admission_id': ids,
+        'updated_at': (pd.Timestamp('2026-01-01', tz='UTC') + pd.to_timedelta(ids, unit='s')).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'heart_rate': table['heart_rate'].to_numpy(),
+        'lactate': table['lactate'].to_numpy(),
+        'ward': table['ward'].astype(str).to_numpy(),
+    })
+
+def make_stub_api(source):
+    # Serves source['records'] in pages, filtered by `updated_since` when given
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            page, limit = int(query['page'][0]), int(query['limit'][0])
+            records = source['records']
+            if 'updated_since' in query:
+                records = records[records['updated_at'] >= query['updated_since'][0]]
+            body = records.iloc[(page - 1) * limit:page * limit].to_json(orient='records').encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def full_refresh(api_url, csv_file, engine):
+    api_df = pd.DataFrame([record for page in iter_pages(api_url, page_size=PAGE_SIZE) for record in page])
+    csv_df = pd.read_csv(csv_file)
+    df = pd.concat([api_df, csv_df], ignore_index=True).drop_duplicates()
+    return load_dataframe(df, 'full_target', engine, mode='replace')
+
+def incremental(api_url, csv_file, engine):
+    api_df, api_watermark = fetch_api_delta(api_url, 'updated_at', get_watermark(engine, api_url), page_size=PAGE_SIZE)
+    csv_df, csv_state = read_csv_delta(csv_file, get_watermark(engine, csv_file))
+    delta, hashes = new_rows(pd.concat([api_df, csv_df], ignore_index=True), engine, 'incremental_target')
+    rows_written = merge_delta(delta, hashes, 'incremental_target', engine, key_columns=['admission_id']) if len(delta) else 0
+    set_watermark(engine, api_url, api_watermark)
+    set_watermark(engine, csv_file, csv_state)
+    return rows_written
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main(max_history=400_000, delta=500):
+    directory = tempfile.mkdtemp()
+    database_url = os.environ.get('DATABASE_URL') or f"sqlite:///{os.path.join(directory, 'bench_sync.db')}"
+    engine = get_engine(database_url)
+    csv_file = os.path.join(directory, 'data.csv')
+
+    # API and CSV each carry half of the records, with disjoint admission ids
+    source = {'records': admissions(0, 0)}
+    server = make_stub_api(source)
+    api_url = f"http://127.0.0.1:{server.server_port}/data"
+    admissions(10 ** 9, 0).to_csv(csv_file, index=False)
+
+    history, n_history = 0, max_history // 8
+    while n_history <= max_history:
+        # Grow the history to n_history rows per source, then sync once to catch up
+        source['records'] = pd.concat([source['records'], admissions(history, n_history - history)], ignore_index=True)
+        admissions(10 ** 9 + history, n_history - history).to_csv(csv_file, mode='a', header=False, index=False)
+        history = n_history
+        incremental(api_url, csv_file, engine)
+
+        # One hour of change: `delta` new admissions per source and a few updated ones
+        new = admissions(history, delta)
+        updated = source['records'].tail(10).assign(heart_rate=0.0, updated_at=new['updated_at'].iloc[-1])
+        source['records'] = pd.concat([source['records'], new, updated], ignore_index=True)
+        admissions(10 ** 9 + history, delta).to_csv(csv_file, mode='a', header=False, index=False)
+        history += delta
+
+        full_rows, full_seconds = timed(full_refresh, api_url, csv_file, engine)
+        delta_rows, delta_seconds = timed(incremental, api_url, csv_file, engine)
+        with engine.connect() as conn:
+            n_full = conn.execute(text("SELECT COUNT(DISTINCT admission_id) FROM full_target")).scalar()
+            n_incremental = conn.execute(text("SELECT COUNT(*) FROM incremental_target")).scalar()
+            n_updated = conn.execute(text("SELECT COUNT(*) FROM incremental_target WHERE heart_rate = 0")).scalar()
+        assert n_full == n_incremental, (n_full, n_incremental)
+        assert n_updated >= len(updated), n_updated
+        print(f"{2 * history:>9} rows of history: full refresh {full_rows:>8} rows in {full_seconds:6.2f}s, "
+              f"incremental {delta_rows:>5} rows in {delta_seconds:5.2f}s")
+        n_history *= 2
+    server.shutdown()
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
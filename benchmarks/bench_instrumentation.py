@@ -0,0 +1,74 @@
+"""
+Cost of the instrumentation layer: a `timed` no-op function undecorated, with recording off and on, per-call
+SepsisPredictor.predict_sepsis latency with recording off and on, and the fused data quality checks with and without
+the sampling profiler.
+
+Usage:
+    python benchmarks/bench_instrumentation.py [n_rows] [calls]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import instrumentation
+import synthetic_icu
+from run_benchmarks import fitted_predictor
+
+def noop():
+    pass
+
+timed_noop = instrumentation.timed('noop')(noop)
+
+def per_call_ns(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls * 1e9
+
+def latencies_us(predictor, records):
+    latencies = []
+    for record in records:
+        start = time.perf_counter()
+        predictor.predict_sepsis(record)
+        latencies.append(time.perf_counter() - start)
+    return np.percentile(np.asarray(latencies) * 1e6, [50, 99])
+
+def main(n_rows=200_000, calls=1_000_000):
+    instrumentation.disable()
+    plain = per_call_ns(noop, calls)
+    disabled = per_call_ns(timed_noop, calls)
+    instrumentation.enable()
+    enabled = per_call_ns(timed_noop, calls)
+    print(f"no-op call: plain {plain:6.0f} ns, timed (off) {disabled:6.0f} ns, timed (on) {enabled:6.0f} ns")
+
+    table = synthetic_icu.make_icu_table(n_rows)
+    predictor = fitted_predictor(table)
+    records = table.iloc[:5_000].to_dict('records')
+    for label, switch in (('off', instrumentation.disable), ('on', instrumentation.enable)):
+        switch()
+        latencies_us(predictor, records[:500])
+        p50, p99 = latencies_us(predictor, records)
+        print(f"predict_sepsis, recording {label:<3}: p50 {p50:7.1f} us  p99 {p99:7.1f} us")
+
+    import data_quality_control_fastapi as dq
+    df = synthetic_icu.dq_upload(table)
+    instrumentation.disable()
+    start = time.perf_counter()
+    dq.run_data_quality_checks(df)
+    unprofiled = time.perf_counter() - start
+    start = time.perf_counter()
+    _, profiler = instrumentation.run_profiled(dq.run_data_quality_checks, df)
+    profiled = time.perf_counter() - start
+    print(f"data quality checks on {n_rows} rows: {unprofiled:.3f}s, profiled {profiled:.3f}s "
+          f"({profiler.samples} samples)")
+    for function in profiler.top(5):
+        print(f"  {function['self']:5} self {function['total']:5} total  {function['function']}")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,62 @@
+"""
+Rows/sec of the bulk loader in warehouse_loader.py against the previous `DataFrame.to_sql` path
+(a new engine per call, default row-wise inserts).
+
+Runs against a local SQLite file by default; set DATABASE_URL to benchmark a PostgreSQL warehouse,
+where the bulk path uses COPY FROM STDIN.
+
+Usage:
+    python benchmarks/bench_loader.py [n_rows]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_icu
+from warehouse_loader import get_engine, load_dataframe
+
+def admission_rows(n, seed=42, start_id=0):
+    # The REST ingestion script's rows (see synthetic_icu.py), one per admission, with ids from `start_id`
+    rows = synthetic_icu.make_dataset('data.csv', n, seed=seed, rows_per_patient=1)
+    return rows.assign(admission_id=np.arange(start_id, start_id + n))
+
+def main(n_rows=200_000):
+    database_url = os.environ.get('DATABASE_URL')
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_loader.db')}"
+    df = admission_rows(n_rows)
+
+    start = time.perf_counter()
+    df.to_sql('bench_to_sql', create_engine(database_url), if_exists='replace', index=False)
+    to_sql_seconds = time.perf_counter() - start
+
+    engine = get_engine(database_url)
+    start = time.perf_counter()
+    load_dataframe(df, 'bench_bulk', engine, mode='replace')
+    bulk_seconds = time.perf_counter() - start
+
+    delta = pd.concat([admission_rows(n_rows // 100, seed=7, start_id=n_rows - n_rows // 200),
+                       admission_rows(n_rows // 200, seed=8, start_id=n_rows)], ignore_index=True)
+    delta = delta.drop_duplicates('admission_id', keep='last')
+    start = time.perf_counter()
+    load_dataframe(delta, 'bench_bulk', engine, mode='upsert', key_columns=['admission_id'])
+    upsert_seconds = time.perf_counter() - start
+
+    with engine.connect() as conn:
+        loaded = conn.execute(text("SELECT COUNT(*) FROM bench_bulk")).scalar()
+    assert loaded == df['admission_id'].nunique() + (delta['admission_id'] >= n_rows).sum()
+
+    print(f"database:     {engine.dialect.name}")
+    print(f"to_sql:       {n_rows / to_sql_seconds:,.0f} rows/s")
+    print(f"bulk load:    {n_rows / bulk_seconds:,.0f} rows/s ({to_sql_seconds / bulk_seconds:.1f}x)")
+    print(f"upsert:       {len(delta):,} rows in {upsert_seconds:.3f}s ({loaded:,} rows in table)")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,100 @@
+"""
+Model artifact cold start: wall time for a fresh interpreter to start, import what it needs, load a saved model and
+score its first patients, for a pickled (joblib) scikit-learn pipeline versus a `model_artifact` directory. Also checks that saved
+artifacts reproduce the in-memory predictions for both the predict.py pipeline and SepsisPredictor.
+
+Usage:
+    python benchmarks/bench_model_artifact.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_artifact
+import synthetic_icu
+from bench_score_census import fit_pipeline, pipeline_proba
+from bench_sepsis_scoring import fitted_predictor
+
+REPEATS = 5
+
+PICKLE_WORKER = """
+import sys, time, joblib, pandas as pd, sklearn, xgboost
+start = time.perf_counter()
+bundle = joblib.load(sys.argv[1])
+census = pd.read_csv(sys.argv[2])
+X = census[bundle['feature_columns']].fillna(bundle['medians']).to_numpy()
+bundle['model'].predict_proba(bundle['selector'].transform(bundle['scaler'].transform(X)))
+print(time.perf_counter() - start)
+"""
+
+ARTIFACT_WORKER = """
+import sys, time, pandas as pd, model_artifact, xgboost
+start = time.perf_counter()
+artifact = model_artifact.load_artifact(sys.argv[1])
+census = pd.read_csv(sys.argv[2])
+artifact.predict_proba_matrix(artifact.transform(census))
+print(time.perf_counter() - start)
+"""
+
+def cold_start(worker, path, census_path):
+    # Median wall seconds of a fresh interpreter running `worker` (imports included), and of its load and first score
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', worker, path, census_path], cwd=repo, check=True,
+                                capture_output=True, text=True).stdout
+        timings.append((time.perf_counter() - start, float(output)))
+    return np.median(timings, axis=0)
+
+def main():
+    directory = tempfile.mkdtemp()
+
+    # SepsisPredictor round trip, with string categories and with int (0/1) and bool categorical columns,
+    # whose category codes are stored under string keys in the manifest
+    patients = synthetic_icu.make_icu_table(5_000)
+    numeric_categories = patients.assign(ventilator=(patients['ventilator'] == 'Yes').astype(int),
+                                         central_line=patients['central_line'] == 'Yes')
+    for label, data in (('string', patients), ('int and bool', numeric_categories)):
+        predictor = fitted_predictor(data)
+        path = os.path.join(directory, 'sepsis_predictor_model')
+        predictor.save(path)
+        loaded = type(predictor).load(path)
+        expected = predictor.predict_proba_matrix(predictor.encode_frame(data))
+        np.testing.assert_array_equal(loaded.predict_proba_matrix(loaded.encode_frame(data)), expected)
+        for record in data.iloc[:20].to_dict('records'):
+            assert loaded.score(record) == predictor.score(record)
+        print(f"loaded SepsisPredictor artifact reproduces the fitted predictor ({label} categories)")
+
+    # predict.py pipeline: pickled estimators versus the artifact
+    artifact_path = os.path.join(directory, 'sepsis_model')
+    pipeline = fit_pipeline()
+    model_artifact.save_pipeline(artifact_path, *pipeline)
+    census_path = synthetic_icu.write_dataset(os.path.join(directory, 'census.csv'), 100, 'new_patient_data.csv')
+    census = pd.read_csv(census_path)
+    artifact = model_artifact.load_artifact(artifact_path)
+    np.testing.assert_allclose(artifact.predict_proba_matrix(artifact.transform(census)), pipeline_proba(pipeline, census),
+                               rtol=1e-6, atol=1e-7)
+    print("loaded pipeline artifact reproduces the scikit-learn pipeline")
+
+    # Pickle the same fitted objects that were saved in the artifact
+    pickle_path = os.path.join(directory, 'sepsis_model.joblib')
+    joblib.dump(dict(zip(['feature_columns', 'medians', 'scaler', 'selector', 'model'], pipeline)), pickle_path)
+
+    artifact_mb = sum(os.path.getsize(os.path.join(artifact_path, name)) for name in os.listdir(artifact_path)) / 2 ** 20
+    for label, worker, path, size_mb in (('joblib pickle', PICKLE_WORKER, pickle_path, os.path.getsize(pickle_path) / 2 ** 20),
+                                         ('model artifact', ARTIFACT_WORKER, artifact_path, artifact_mb)):
+        total, load = cold_start(worker, path, census_path)
+        print(f"{label:>14} ({size_mb:.2f} MB): process start to first score {total * 1000:6.0f} ms, "
+              f"load and first score after imports {load * 1000:5.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+predict.py's hyperparameter search: the original BayesSearchCV over data preprocessed once on the full dataset
+(n_jobs=-1 on top of XGBoost's own threads) versus sepsis_pipeline.search (per-fold preprocessing inside the
+pipeline, without and with the disk cache), and a search resumed from a checkpoint halfway through.
+Reports wall-clock per stage and the holdout accuracy of each search's best model.
+
+Usage:
+    python benchmarks/bench_predict_pipeline.py [n_rows] [n_iter]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from sklearn.feature_selection import SelectKBest, f_classif
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from skopt import BayesSearchCV
+from xgboost import XGBClassifier
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sepsis_pipeline
+import synthetic_icu
+
+def original_search(X_train, y_train, X_test, y_test, n_iter):
+    # predict.py before the pipeline: preprocessing fitted once, outside the folds, then BayesSearchCV
+    timer = sepsis_pipeline.StageTimer()
+    with timer.stage('preprocess'):
+        imputer = SimpleImputer(strategy='median').fit(X_train)
+        scaler = StandardScaler().fit(imputer.transform(X_train))
+        selector = SelectKBest(f_classif, k=10).fit(scaler.transform(imputer.transform(X_train)), y_train)
+        transform = lambda X: selector.transform(scaler.transform(imputer.transform(X)))
+        X_selected = transform(X_train)
+    with timer.stage('search'):
+        space = {name.split('__', 1)[1]: dimension for name, dimension in sepsis_pipeline.SEARCH_SPACE.items()}
+        search = BayesSearchCV(XGBClassifier(objective='binary:logistic', random_state=42), space, n_iter=n_iter,
+                               cv=5, n_jobs=-1, scoring='accuracy', random_state=42)
+        search.fit(X_selected, y_train)
+    accuracy = accuracy_score(y_test, search.predict(transform(X_test)))
+    return timer, accuracy
+
+def pipeline_search(X_train, y_train, X_test, y_test, n_iter, cache_dir, checkpoint_path=None):
+    timer = sepsis_pipeline.StageTimer()
+    with timer.stage('search'):
+        search = sepsis_pipeline.search(X_train, y_train, n_iter=n_iter, cache_dir=cache_dir,
+                                        checkpoint_path=checkpoint_path)
+    with timer.stage('refit'):
+        pipeline = sepsis_pipeline.fit_best(X_train, y_train, search.best_params)
+    return timer, accuracy_score(y_test, pipeline.predict(X_test)), search
+
+def main(n_rows=50_000, n_iter=12):
+    data = synthetic_icu.make_dataset('sepsis_data.csv', n_rows, seed=1)
+    y = data.pop('sepsis').to_numpy()
+    X = data.drop(columns=['PatientID', 'HospitalID', 'AdmissionID']).to_numpy(dtype=float)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    directory = tempfile.mkdtemp()
+    print(f"{n_rows} rows, {X.shape[1]} features, {n_iter} candidates x 5 folds, {os.cpu_count()} CPUs")
+
+    start = time.perf_counter()
+    timer, accuracy = original_search(X_train, y_train, X_test, y_test, n_iter)
+    print(f"original BayesSearchCV:   {time.perf_counter() - start:6.1f}s  holdout accuracy {accuracy:.4f}  "
+          f"{timer.seconds}")
+
+    for label, cache_dir in (('pipeline, no cache', None), ('pipeline, cold cache', os.path.join(directory, 'cache')),
+                             ('pipeline, warm cache', os.path.join(directory, 'cache'))):
+        start = time.perf_counter()
+        timer, accuracy, search = pipeline_search(X_train, y_train, X_test, y_test, n_iter, cache_dir)
+        print(f"{label + ':':<25} {time.perf_counter() - start:6.1f}s  holdout accuracy {accuracy:.4f}  "
+              f"{search.summary()}")
+
+    # Interrupted after half the candidates, then resumed from the checkpoint
+    checkpoint_path = os.path.join(directory, 'checkpoint.json')
+    sepsis_pipeline.search(X_train, y_train, n_iter=n_iter // 2, cache_dir=os.path.join(directory, 'cache'),
+                           checkpoint_path=checkpoint_path)
+    start = time.perf_counter()
+    search = sepsis_pipeline.search(X_train, y_train, n_iter=n_iter, cache_dir=os.path.join(directory, 'cache'),
+                                    checkpoint_path=checkpoint_path)
+    print(f"{'resumed at half:':<25} {time.perf_counter() - start:6.1f}s  {search.summary()}")
+    shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
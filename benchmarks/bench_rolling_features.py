@@ -0,0 +1,92 @@
+"""
+Rolling-window features for SepsisPredictor: the incremental engine (rolling_features) versus pandas
+groupby().rolling() passes (mean, min and max per window, rolling apply for the slope, ffill for the last value).
+Reports the offline backfill time of both, checks that they agree, and reports the online cost per new record:
+one engine update versus recomputing the patient's features from their history with pandas. The measurements are the
+hourly rows of the synthetic ICU table (see synthetic_icu.py), interleaved across patients in time order.
+
+Usage:
+    python benchmarks/bench_rolling_features.py [n_patients] [hours]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_icu
+from bench_sepsis_scoring import percentiles
+from rolling_features import WINDOW_AGGREGATES, RollingFeatureSpec
+
+SPEC = RollingFeatureSpec(signals=['heart_rate', 'mean_bp', 'spo2', 'lactate'], windows=['1h', '6h'])
+
+def _slope(values):
+    values = values.dropna()
+    seconds = (values.index - values.index[0]).total_seconds().to_numpy() if len(values) else None
+    if len(values) < 2 or np.ptp(seconds) == 0:
+        return np.nan
+    return np.polyfit(seconds, values.to_numpy(), 1)[0] * 3600
+
+def pandas_features(data, spec=SPEC):
+    # The offline groupby().rolling() passes, returned in `data`'s row order
+    ordered = data.sort_values([spec.patient_column, spec.time_column], kind='stable')
+    indexed = ordered.set_index(spec.time_column)
+    groups = indexed.groupby(spec.patient_column)
+    features = {}
+    times = ordered[spec.time_column]
+    for signal in spec.signals:
+        features[f"{signal}_last"] = ordered.groupby(spec.patient_column)[signal].ffill().to_numpy()
+        measured = times.where(ordered[signal].notna()).groupby(ordered[spec.patient_column]).ffill()
+        features[f"{signal}_since_last"] = ((times - measured).dt.total_seconds() / 3600).to_numpy()
+        for window in spec.windows:
+            rolling = groups[signal].rolling(window)
+            for aggregate, values in (('mean', rolling.mean()), ('min', rolling.min()), ('max', rolling.max()),
+                                      ('slope', rolling.apply(_slope, raw=False))):
+                features[f"{signal}_{aggregate}_{window}"] = values.to_numpy()
+    return pd.DataFrame(features, index=ordered.index)[spec.feature_names].loc[data.index]
+
+def online_latencies(data, n_records=50):
+    # Replay the feed through one engine; time the last `n_records` updates and the pandas recomputation for each
+    engine = SPEC.engine()
+    records = data.to_dict('records')
+    engine_latencies, pandas_latencies = [], []
+    for position, record in enumerate(records):
+        start = time.perf_counter()
+        features = engine.update_record(record)
+        engine_latencies.append(time.perf_counter() - start)
+        if position >= len(records) - n_records:
+            start = time.perf_counter()
+            history = data.iloc[:position + 1]
+            history = history.loc[history['patient_id'] == record['patient_id']]
+            expected = pandas_features(history).iloc[-1]
+            pandas_latencies.append(time.perf_counter() - start)
+            np.testing.assert_allclose(list(features.values()), expected.to_numpy(), rtol=1e-6, atol=1e-6)
+    return engine_latencies[-n_records:], pandas_latencies
+
+def main(n_patients=2_400, hours=24):
+    table = synthetic_icu.make_icu_table(n_patients * hours, rows_per_patient=hours)
+    # Interleave the patients in time order, as a feed would deliver them
+    data = table[[SPEC.patient_column, SPEC.time_column] + SPEC.signals].sort_values(SPEC.time_column, kind='stable')
+    data = data.reset_index(drop=True)
+    print(f"{len(data)} measurement rows, {n_patients} patients, {len(SPEC.feature_names)} features "
+          f"({', '.join(WINDOW_AGGREGATES)} over {SPEC.windows}, last value, hours since last)")
+
+    start = time.perf_counter()
+    expected = pandas_features(data)
+    pandas_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    features = SPEC.engine().backfill(data)
+    engine_seconds = time.perf_counter() - start
+    np.testing.assert_allclose(features.to_numpy(), expected.to_numpy(), rtol=1e-6, atol=1e-6)
+    print(f"offline backfill: pandas groupby().rolling() {pandas_seconds:.2f}s, engine {engine_seconds:.2f}s "
+          f"({pandas_seconds / engine_seconds:.1f}x); features match")
+
+    engine_latencies, pandas_latencies = online_latencies(data)
+    print(f"online, per new record: engine   {percentiles(engine_latencies)}")
+    print(f"                        pandas   {percentiles(pandas_latencies)}  (recompute from the patient's history)")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
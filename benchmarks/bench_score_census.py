@@ -0,0 +1,88 @@
+"""
+Bulk census scoring: checks `score_census` against the fitted predict.py preprocessing and model applied to
+the whole file in memory, then reports throughput and peak resident memory (in a fresh process per run) as the census grows.
+With several workers the peak is that of the parent process, which reads the census and writes the scores.
+
+Usage:
+    python benchmarks/bench_score_census.py [max_rows] [n_jobs]
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_selection import SelectKBest, f_classif
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBClassifier
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_artifact
+import score_census
+import synthetic_icu
+from bench_dqc_chunked import peak_memory
+
+def fit_pipeline():
+    # The same steps as predict.py, with fixed hyperparameters instead of the Bayesian search
+    data = synthetic_icu.make_dataset('sepsis_data.csv', 20_000, seed=1).drop(columns=score_census.ID_COLUMNS)
+    target = data.pop('sepsis')
+    medians = data.median()
+    X = data.fillna(medians).to_numpy()
+    scaler = StandardScaler().fit(X)
+    selector = SelectKBest(f_classif, k=10).fit(scaler.transform(X), target)
+    model = XGBClassifier(n_estimators=200, max_depth=6, tree_method='hist', random_state=42)
+    model.fit(selector.transform(scaler.transform(X)), target)
+    return list(data.columns), medians, scaler, selector, model
+
+def pipeline_proba(pipeline, census):
+    feature_columns, medians, scaler, selector, model = pipeline
+    X = census[feature_columns].fillna(medians).to_numpy()
+    return model.predict_proba(selector.transform(scaler.transform(X)))[:, 1]
+
+def score_in_memory(census_path, model_path):
+    artifact = model_artifact.load_artifact(model_path)
+    census = pd.read_csv(census_path)
+    return artifact.predict_proba_matrix(artifact.transform(census))
+
+def _score_census_task(args):
+    score_census.score_census(*args)
+
+def _score_in_memory_task(args):
+    score_in_memory(*args)
+
+def main(max_rows=3_200_000, n_jobs=None):
+    n_jobs = n_jobs or os.cpu_count()
+    directory = tempfile.mkdtemp()
+    model_path = os.path.join(directory, 'sepsis_model')
+    pipeline = fit_pipeline()
+    model_artifact.save_pipeline(model_path, *pipeline)
+
+    census_path = synthetic_icu.write_dataset(os.path.join(directory, 'check.csv'), 50_000, 'new_patient_data.csv')
+    census = pd.read_csv(census_path)
+    expected = pipeline_proba(pipeline, census)
+    for jobs, output in ((1, 'check.csv'), (2, 'check.parquet')):
+        output_path = os.path.join(directory, 'scores_' + output)
+        score_census.score_census(census_path, output_path, model_path, chunk_size=7_000, n_jobs=jobs)
+        scores = pd.read_parquet(output_path) if output.endswith('.parquet') else pd.read_csv(output_path)
+        assert (scores['PatientID'] == census['PatientID']).all()
+        np.testing.assert_allclose(scores['sepsis_probability'], expected, rtol=1e-5, atol=1e-6)
+    print("chunked scores (CSV and Parquet, 1 and 2 workers) match the fitted scikit-learn pipeline")
+
+    n_rows = max_rows // 16
+    while n_rows <= max_rows:
+        census_path = synthetic_icu.write_dataset(os.path.join(directory, f"{n_rows}.csv"), n_rows,
+                                                  'new_patient_data.csv')
+        size_mb = os.path.getsize(census_path) / 2 ** 20
+        output_path = os.path.join(directory, 'scores.parquet')
+        for jobs in sorted({1, n_jobs}):
+            seconds, peak = peak_memory(_score_census_task, (census_path, output_path, model_path, score_census.CHUNK_SIZE, jobs))
+            print(f"{n_rows:>9} rows ({size_mb:6.1f} MB), {jobs} worker(s): {n_rows / seconds:>9,.0f} rows/s, "
+                  f"peak {peak / 2 ** 20:6.1f} MB")
+        in_memory_seconds, in_memory_peak = peak_memory(_score_in_memory_task, (census_path, model_path))
+        print(f"{'':>9} in memory, one process:  {n_rows / in_memory_seconds:>9,.0f} rows/s, peak {in_memory_peak / 2 ** 20:6.1f} MB")
+        n_rows *= 2
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,99 @@
+"""
+Latency benchmark of SepsisPredictor scoring.
+
+- Per-call latency of the previous pandas/LabelEncoder path, `SepsisPredictor.score` and the micro-batcher.
+- Open-loop load at fixed request rates through `MicroBatcher`, reporting p50/p99 latency measured
+  from each request's scheduled send time.
+
+Usage:
+    python benchmarks/bench_sepsis_scoring.py [seconds_per_rate]
+"""
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from xgboost import XGBClassifier
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_icu
+from predict_sepsis import SepsisPredictor
+from sepsis_serving import MicroBatcher
+
+def fitted_predictor(data):
+    predictor = SepsisPredictor()
+    X, y = predictor.preprocess_data(data)
+    predictor.xgb_model = XGBClassifier(n_estimators=200, max_depth=6, tree_method='hist', random_state=42).fit(X, y)
+    return predictor
+
+def legacy_predict_sepsis(predictor, patient_data):
+    # The per-call pandas path SepsisPredictor.predict_sepsis used before the lookup tables
+    patient_data = pd.DataFrame(patient_data, index=[0], columns=predictor.selected_features)
+    for feature in predictor.categorical_features:
+        patient_data[feature] = predictor.encoders[feature].transform(patient_data[feature])
+    for feature in predictor.boolean_features:
+        patient_data[feature] = patient_data[feature].astype(int)
+    return "Sepsis detected." if predictor.xgb_model.predict(patient_data)[0] == 1 else "Sepsis not detected."
+
+def percentiles(latencies):
+    latencies = np.asarray(latencies) * 1000
+    return f"p50 {np.percentile(latencies, 50):7.3f} ms   p99 {np.percentile(latencies, 99):7.3f} ms"
+
+def per_call(func, patients):
+    latencies = []
+    for patient in patients:
+        start = time.perf_counter()
+        func(patient)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def open_loop(batcher, patients, rate, seconds):
+    # Send requests on a fixed schedule regardless of completions and time each from its scheduled send
+    n_requests = max(1, int(rate * seconds))
+    latencies = [None] * n_requests
+    done = threading.Semaphore(0)
+
+    def record(i, scheduled):
+        def callback(future):
+            latencies[i] = time.perf_counter() - scheduled
+            done.release()
+        return callback
+
+    start = time.perf_counter()
+    for i in range(n_requests):
+        scheduled = start + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        batcher.submit(patients[i % len(patients)]).add_done_callback(record(i, scheduled))
+    for _ in range(n_requests):
+        done.acquire()
+    return latencies
+
+def main(seconds_per_rate=5):
+    # Without missing values, which the legacy path reads into an object column it cannot score
+    data = synthetic_icu.make_icu_table(20_000, missing_rate=0)
+    predictor = fitted_predictor(data)
+    patients = data[predictor.selected_features].head(1000).to_dict('records')
+
+    for patient in patients[:200]:
+        assert predictor.predict_sepsis(patient) == legacy_predict_sepsis(predictor, patient)
+
+    batcher = MicroBatcher(predictor)
+    print("single call latency")
+    print(f"  legacy pandas path:  {percentiles(per_call(lambda p: legacy_predict_sepsis(predictor, p), patients[:300]))}")
+    print(f"  score():             {percentiles(per_call(predictor.score, patients))}")
+    print(f"  micro-batcher:       {percentiles(per_call(batcher.score, patients))}")
+
+    print("open-loop load through the micro-batcher")
+    for rate in (1, 100, 10_000):
+        seconds = min(seconds_per_rate, 5) if rate == 1 else seconds_per_rate
+        latencies = open_loop(batcher, patients, rate, seconds)
+        print(f"  {rate:>6} req/s:        {percentiles(latencies)}   ({len(latencies)} requests)")
+    batcher.close()
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5)
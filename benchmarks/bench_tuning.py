@@ -0,0 +1,59 @@
+"""
+SepsisPredictor hyperparameter search: the CPU tuning engine (xgb_tuning.tune) versus exhaustive cross-validation of
+the same trials (every fold trained to the trial's full n_estimators with XGBClassifier and cross_val_score, as the
+original train_model intended, on `hist` instead of the unavailable `gpu_hist`).
+Reports wall-clock, trees trained and the holdout logloss of each approach's chosen hyperparameters.
+
+Usage:
+    python benchmarks/bench_tuning.py [n_rows] [n_trials]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics import log_loss
+from sklearn.model_selection import cross_val_score, train_test_split
+from xgboost import XGBClassifier
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_icu
+import xgb_tuning
+from predict_sepsis import SepsisPredictor
+
+PBOUNDS = {'max_depth': (3, 20), 'learning_rate': (0.01, 0.3), 'n_estimators': (100, 1000), 'gamma': (0, 1),
+           'min_child_weight': (1, 10), 'max_delta_step': (0, 10), 'subsample': (0.5, 1), 'colsample_bytree': (0.5, 1)}
+
+def exhaustive_cv(X, y, trials):
+    # Every trial on every fold to its full n_estimators; the folds are re-binned for each model
+    start = time.perf_counter()
+    scores = []
+    for trial in trials:
+        model = XGBClassifier(**trial.params, tree_method='hist', random_state=42)
+        scores.append(cross_val_score(model, X, y, cv=5, scoring='neg_log_loss').mean())
+    best = trials[int(np.argmax(scores))]
+    trees = sum(trial.params['n_estimators'] * 5 for trial in trials)
+    return best.params, trees, time.perf_counter() - start
+
+def holdout_logloss(params, X_train, y_train, X_test, y_test):
+    model = XGBClassifier(**params, tree_method='hist', random_state=42).fit(X_train, y_train)
+    return log_loss(y_test, model.predict_proba(X_test)[:, 1])
+
+def main(n_rows=20_000, n_trials=12):
+    predictor = SepsisPredictor()
+    X, y = predictor.preprocess_data(synthetic_icu.make_icu_table(n_rows))
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    result = xgb_tuning.tune(X_train, y_train, PBOUNDS, n_iter=n_trials // 2, init_points=n_trials - n_trials // 2)
+    print(f"tuning engine: {result.summary()}")
+
+    best_params, exhaustive_trees, exhaustive_seconds = exhaustive_cv(X_train, y_train, result.trials)
+    print(f"exhaustive CV of the same {len(result.trials)} trials: {exhaustive_trees} trees in {exhaustive_seconds:.1f}s")
+    print(f"savings: {exhaustive_seconds / result.seconds:.1f}x wall-clock, "
+          f"{1 - result.trees_trained / exhaustive_trees:.0%} fewer trees")
+    print(f"holdout logloss: tuning engine {holdout_logloss(result.best_params, X_train, y_train, X_test, y_test):.4f}, "
+          f"exhaustive CV {holdout_logloss(best_params, X_train, y_train, X_test, y_test):.4f}")
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,56 @@
+"""
+Throughput benchmark of the streaming VitalsMonitor, fed the vitals of the synthetic ICU table (see synthetic_icu.py)
+in time order. The final per-patient statuses are checked against `sepsis_protocol` and `shock_protocol` run on the
+reconstructed snapshots.
+
+Usage:
+    python benchmarks/bench_vitals_monitor.py [n_events] [n_patients]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import icudguide
+import synthetic_icu
+from vitals_monitor import SIGNALS, VitalsMonitor
+
+def table_events(n_events, n_patients):
+    # Up to `n_events` (patient_id, signal, value, sequence number) events from the table's rows in time order,
+    # one per measured vital
+    rows_per_patient = -(-n_events // (n_patients * len(SIGNALS)))
+    table = synthetic_icu.make_icu_table(n_patients * rows_per_patient, rows_per_patient=rows_per_patient)
+    table = table.sort_values('timestamp', kind='stable')
+    patients = np.repeat(table['patient_id'].to_numpy(), len(SIGNALS))
+    signals = np.tile(np.array(SIGNALS, dtype=object), len(table))
+    values = table[list(SIGNALS)].to_numpy(dtype=np.float64).ravel()
+    measured = ~np.isnan(values)
+    return list(zip(patients[measured].tolist(), signals[measured].tolist(), values[measured].tolist(), range(n_events)))
+
+def main(n_events=1_000_000, n_patients=5_000):
+    events = table_events(n_events, n_patients)
+    n_events = len(events)
+    monitor = VitalsMonitor()
+
+    start = time.perf_counter()
+    transitions = sum(1 for _ in monitor.process(events))
+    seconds = time.perf_counter() - start
+
+    patients, values = monitor.snapshot()
+    for patient_id, row in zip(patients, values):
+        patient_data = dict(zip(SIGNALS, row.tolist()))
+        expected_sepsis = icudguide.sepsis_protocol(patient_data) == icudguide.PROTOCOL_MESSAGES['sepsis'][1]
+        expected_shock = icudguide.shock_protocol(patient_data) == icudguide.PROTOCOL_MESSAGES['shock'][1]
+        status = monitor.status(patient_id)
+        assert status['sepsis'] == expected_sepsis and status['shock'] == expected_shock, patient_id
+
+    print(f"events:       {n_events} over {len(patients)} patients")
+    print(f"transitions:  {transitions}")
+    print(f"elapsed:      {seconds:.3f}s ({n_events / seconds:,.0f} events/s)")
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,64 @@
+"""
+Load test of the /data_quality_checks/ endpoint with a local client.
+
+Uploads `n_uploads` CSV files concurrently and, while they are being checked, measures the latency of a
+lightweight request (/openapi.json) to show whether the event loop stays responsive.
+
+Usage:
+    python benchmarks/load_fastapi.py [n_rows] [n_uploads]
+"""
+import asyncio
+import io
+import os
+import sys
+import time
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic_icu
+from data_quality_control_fastapi import app
+
+async def upload(client, payload):
+    start = time.perf_counter()
+    response = await client.post('/data_quality_checks/?format=json', files={'file': ('data.csv', payload, 'text/csv')})
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+async def probe(client, stop):
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        (await client.get('/openapi.json')).raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.01)
+    return latencies
+
+async def run(n_rows, n_uploads):
+    buffer = io.StringIO()
+    synthetic_icu.make_dataset('dq_upload.csv', n_rows).to_csv(buffer, index=False)
+    payload = buffer.getvalue().encode('utf-8')
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://test', timeout=None) as client:
+        single_seconds = await upload(client, payload)
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(client, stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(upload(client, payload) for _ in range(n_uploads)))
+        concurrent_seconds = time.perf_counter() - start
+        stop.set()
+        latencies = await probe_task
+
+    print(f"upload:            {len(payload) / 2 ** 20:.1f} MB ({n_rows} rows)")
+    print(f"single upload:     {single_seconds:.2f}s")
+    print(f"{n_uploads} concurrent:     {concurrent_seconds:.2f}s (serialized would be ~{single_seconds * n_uploads:.2f}s)")
+    if latencies:
+        print(f"probe during load: {len(latencies)} requests, p50 {np.percentile(latencies, 50) * 1000:.1f} ms, "
+              f"max {max(latencies) * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:3]]
+    asyncio.run(run(*(args + [200_000, 4][len(args):])))
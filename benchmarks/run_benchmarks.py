@@ -0,0 +1,271 @@
+"""
+Benchmark suite over synthetic ICU data (see synthetic_icu.py): times and memory-profiles the main hot paths at each
+size and writes the results as JSON, so runs of different versions can be compared.
+
+Every case runs in a fresh process. Its setup (generating or reading the data, fitting a model) is not measured;
+for the measured call the results record the wall-clock seconds, the resident memory before the call and the peak
+resident memory during it (Linux). The CSV files that cases read are generated once per size. A case whose process
+dies without reporting (e.g. killed for running out of memory) or runs past `--timeout` seconds is recorded as
+failed, and the suite goes on with the next case.
+
+Cases:
+    icudguide.evaluate_protocols     the batch protocol engine on the whole table
+    icudguide.scalar_protocols       the five scalar protocol functions, one dict per patient (up to 1M rows)
+    dqc.main                         dqc.main on `Suicide data.csv`, including its first (converting) columnar-cache load
+    dq.run_data_quality_checks       the fused data quality checks on `dq_upload.csv`
+    SepsisPredictor.preprocess_data  encoding of the training table
+    SepsisPredictor.predict_sepsis   one call per patient, on up to 10,000 patients (per-call percentiles in `extra`)
+    SepsisPredictor.score_batch      encode_frame and one booster call for the whole table
+    ingestion.clean_and_load         the REST script's read_csv_file, clean_data and load into SQLite
+
+Usage:
+    python benchmarks/run_benchmarks.py [--sizes 10000 1000000 10000000] [--cases NAME ...] [--output results.json]
+                                        [--compare baseline.json] [--tolerance 1.25] [--timeout SECONDS]
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_module
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import synthetic_icu
+
+SIZES = [10_000, 1_000_000, 10_000_000]
+FIT_ROWS = 50_000
+PREDICT_CALLS = 10_000
+SCALAR_MAX_ROWS = 1_000_000
+# Seconds between checks that a case's process is still alive
+POLL_SECONDS = 1.0
+
+def _status(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field):
+                return int(line.split()[1]) * 1024
+
+def reset_peak_rss():
+    # Reset the process's high-water RSS (Linux 4.0+), so the peak covers only the measured call
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+def fitted_predictor(table):
+    from xgboost import XGBClassifier
+    from predict_sepsis import SepsisPredictor
+    predictor = SepsisPredictor()
+    X, y = predictor.preprocess_data(table.iloc[:FIT_ROWS])
+    predictor.xgb_model = XGBClassifier(n_estimators=100, max_depth=6, tree_method='hist', random_state=42).fit(X, y)
+    return predictor
+
+def load_ingestion_module():
+    path = os.path.join(ROOT, 'RestFul API Request Optimization - Cache & Pagination.py')
+    spec = importlib.util.spec_from_file_location('rest_ingestion', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# Each setup takes (n_rows, data_dir) and returns (the call to measure, a dict of extra results it fills)
+
+def setup_evaluate_protocols(n_rows, data_dir):
+    import icudguide
+    table = synthetic_icu.make_icu_table(n_rows)[icudguide.PROTOCOL_FIELDS]
+    return lambda: icudguide.evaluate_protocols(table), {}
+
+def setup_scalar_protocols(n_rows, data_dir):
+    import icudguide
+    functions = [icudguide.sepsis_protocol, icudguide.shock_protocol, icudguide.ventilator_protocol,
+                 icudguide.pain_management_protocol, icudguide.glycemic_control_protocol]
+    records = synthetic_icu.make_icu_table(n_rows)[icudguide.PROTOCOL_FIELDS].to_dict('records')
+    return lambda: [[function(record) for record in records] for function in functions], {}
+
+def setup_dqc_main(n_rows, data_dir):
+    import dqc
+    path = os.path.join(data_dir, 'Suicide data.csv')
+    def run():
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            dqc.main(path)
+    return run, {}
+
+def setup_data_quality_checks(n_rows, data_dir):
+    import data_quality_control_fastapi as dq
+    df = pd.read_csv(os.path.join(data_dir, 'dq_upload.csv'), parse_dates=['date_column'])
+    return lambda: dq.run_data_quality_checks(df), {}
+
+def setup_preprocess_data(n_rows, data_dir):
+    from predict_sepsis import SepsisPredictor
+    table = synthetic_icu.make_icu_table(n_rows)
+    return lambda: SepsisPredictor().preprocess_data(table), {}
+
+def setup_predict_sepsis(n_rows, data_dir):
+    table = synthetic_icu.make_icu_table(n_rows)
+    predictor = fitted_predictor(table)
+    records = table.iloc[:PREDICT_CALLS].to_dict('records')
+    extra = {'calls': len(records)}
+    def run():
+        latencies = []
+        for record in records:
+            start = time.perf_counter()
+            predictor.predict_sepsis(record)
+            latencies.append(time.perf_counter() - start)
+        latencies = np.asarray(latencies) * 1e6
+        extra.update(p50_us=float(np.percentile(latencies, 50)), p99_us=float(np.percentile(latencies, 99)))
+    return run, extra
+
+def setup_score_batch(n_rows, data_dir):
+    table = synthetic_icu.make_icu_table(n_rows)
+    predictor = fitted_predictor(table)
+    return lambda: predictor.predict_proba_matrix(predictor.encode_frame(table)), {}
+
+def setup_clean_and_load(n_rows, data_dir):
+    from warehouse_loader import get_engine, load_dataframe
+    ingestion = load_ingestion_module()
+    engine = get_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'warehouse.sqlite')}")
+    extra = {}
+    def run():
+        start = time.perf_counter()
+        df = ingestion.read_csv_file(os.path.join(data_dir, 'data.csv'))
+        extra['read_seconds'] = time.perf_counter() - start
+        df = ingestion.clean_data(df)
+        extra['clean_seconds'] = time.perf_counter() - start - extra['read_seconds']
+        extra['rows_loaded'] = load_dataframe(df, 'target_table', engine, mode='replace')
+        extra['load_seconds'] = time.perf_counter() - start - extra['read_seconds'] - extra['clean_seconds']
+    return run, extra
+
+# {case: (setup, CSV files it reads, largest size it runs at)}
+CASES = {
+    'icudguide.evaluate_protocols': (setup_evaluate_protocols, [], None),
+    'icudguide.scalar_protocols': (setup_scalar_protocols, [], SCALAR_MAX_ROWS),
+    'dqc.main': (setup_dqc_main, ['Suicide data.csv'], None),
+    'dq.run_data_quality_checks': (setup_data_quality_checks, ['dq_upload.csv'], None),
+    'SepsisPredictor.preprocess_data': (setup_preprocess_data, [], None),
+    'SepsisPredictor.predict_sepsis': (setup_predict_sepsis, [], None),
+    'SepsisPredictor.score_batch': (setup_score_batch, [], None),
+    'ingestion.clean_and_load': (setup_clean_and_load, ['data.csv'], None),
+}
+
+def _run_case(case, n_rows, data_dir, queue):
+    try:
+        # Keep the caches the entry points write (columnar cache, API cache) out of the working tree
+        os.chdir(tempfile.mkdtemp())
+        os.environ['CSV_CACHE_DIR'] = os.path.join(os.getcwd(), 'columnar_cache')
+        run, extra = CASES[case][0](n_rows, data_dir)
+        rss_before = _status('VmRSS:')
+        reset = reset_peak_rss()
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        queue.put({'seconds': seconds, 'rss_before_mb': rss_before / 2 ** 20,
+                   'peak_rss_mb': _status('VmHWM:') / 2 ** 20, 'peak_reset': reset, 'extra': extra})
+    except Exception as error:
+        queue.put({'error': f"{type(error).__name__}: {error}"})
+
+def run_case(case, n_rows, data_dir, timeout=None):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_case, args=(case, n_rows, data_dir, queue))
+    process.start()
+    start = time.perf_counter()
+    while True:
+        try:
+            result = queue.get(timeout=POLL_SECONDS)
+            break
+        except queue_module.Empty:
+            pass
+        if process.exitcode is not None:
+            # The process may have put its result just before exiting
+            try:
+                result = queue.get(timeout=POLL_SECONDS)
+            except queue_module.Empty:
+                result = {'error': f"process exited with code {process.exitcode} without a result"}
+            break
+        if timeout is not None and time.perf_counter() - start > timeout:
+            process.terminate()
+            result = {'error': f"timed out after {timeout:g}s"}
+            break
+    process.join()
+    return {'case': case, 'rows': n_rows, **result}
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    import sklearn
+    import xgboost
+    return {'commit': commit or None, 'timestamp': pd.Timestamp.now(tz='UTC').isoformat(),
+            'python': platform.python_version(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'sklearn': sklearn.__version__,
+            'xgboost': xgboost.__version__}
+
+def compare(results, baseline, tolerance):
+    """
+    Print each case's time and peak memory relative to `baseline` and return the cases slower than `tolerance`x.
+    """
+    previous = {(result['case'], result['rows']): result for result in baseline['results'] if 'seconds' in result}
+    regressions = []
+    for result in results:
+        before = previous.get((result['case'], result['rows']))
+        if before is None or 'seconds' not in result:
+            continue
+        ratio = result['seconds'] / before['seconds']
+        flag = ' REGRESSION' if ratio > tolerance else ''
+        print(f"{result['case']:<34} {result['rows']:>10}  time {ratio:5.2f}x  "
+              f"peak RSS {result['peak_rss_mb'] / before['peak_rss_mb']:5.2f}x{flag}")
+        if flag:
+            regressions.append(result)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--cases', nargs='+', default=list(CASES), choices=list(CASES))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="slowdown flagged as a regression")
+    parser.add_argument('--timeout', type=float, help="seconds after which a case is stopped and recorded as failed")
+    args = parser.parse_args()
+
+    report = {'environment': environment(), 'results': []}
+    with tempfile.TemporaryDirectory() as data_dir:
+        for n_rows in args.sizes:
+            for dataset in sorted({dataset for case in args.cases for dataset in CASES[case][1]}):
+                synthetic_icu.write_dataset(os.path.join(data_dir, dataset), n_rows)
+            for case in args.cases:
+                max_rows = CASES[case][2]
+                if max_rows is not None and n_rows > max_rows:
+                    continue
+                result = run_case(case, n_rows, data_dir, args.timeout)
+                report['results'].append(result)
+                if 'error' in result:
+                    print(f"{case:<34} {n_rows:>10}  failed: {result['error']}")
+                else:
+                    print(f"{case:<34} {n_rows:>10}  {result['seconds']:9.3f}s  "
+                          f"RSS {result['rss_before_mb']:8.1f} MB -> peak {result['peak_rss_mb']:8.1f} MB")
+                # Rewrite after every case, so a long run that is interrupted keeps its results
+                with open(args.output, 'w') as file:
+                    json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(report['results'], json.load(file), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
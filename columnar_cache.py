@@ -0,0 +1,178 @@
+"""
+Columnar on-disk cache for the CSV entry points.
+
+`load_csv(path, columns, schema)` parses a CSV file once (with the multithreaded Arrow CSV reader), applies compact
+dtypes and writes the table to an uncompressed Arrow IPC file in CACHE_DIR. Later loads memory-map that file and
+convert only the requested columns to pandas, so nothing is re-parsed and unused columns are never read from disk.
+
+Dtypes:
+ - columns declared in `schema` ({column: dtype}) get that dtype: 'category', 'bool', 'string', 'datetime' or a
+   NumPy numeric dtype such as 'float32' or 'int16'
+ - other integer columns are downcast to the smallest integer type that holds their range (lossless)
+ - other string columns become categoricals when at most CATEGORY_RATIO of their values, and no more than
+   MAX_CATEGORIES values, are distinct (unless `auto_categories` is False, for consumers that write new values into
+   string columns), so identifiers and free text stay strings
+ - other floats stay float64, and dates and timestamps recognised by the parser become datetime64
+
+Cache entries are keyed by the CSV's path, size, modification time and a hash of its first and last MiB (plus the
+schema), so an edited file is converted again without hashing the whole file on every load.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+import instrumentation
+
+CACHE_DIR = os.environ.get('CSV_CACHE_DIR', '.columnar_cache')
+
+# String columns with at most this fraction of distinct values, and at most MAX_CATEGORIES of them, are stored as
+# categoricals
+CATEGORY_RATIO = 0.05
+MAX_CATEGORIES = 10_000
+
+# Bytes hashed at each end of the CSV file for the cache key
+FINGERPRINT_BYTES = 1 << 20
+
+# Part of the cache key: bumped when the conversion changes, so older cache entries are converted again
+FORMAT_VERSION = 2
+
+INTEGER_TYPES = [pa.int8(), pa.int16(), pa.int32(), pa.int64()]
+
+
+def arrow_type(dtype):
+    """
+    Arrow type for a declared dtype (other than 'category').
+    """
+    if dtype == 'string':
+        return pa.string()
+    if dtype == 'datetime':
+        return pa.timestamp('ns')
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def file_fingerprint(path):
+    """
+    Hash of the file's size, modification time and first and last FINGERPRINT_BYTES.
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(path, 'rb') as file:
+        digest.update(file.read(FINGERPRINT_BYTES))
+        if stat.st_size > FINGERPRINT_BYTES:
+            file.seek(max(FINGERPRINT_BYTES, stat.st_size - FINGERPRINT_BYTES))
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def _cache_prefix(path):
+    # File name prefix shared by every cache entry of the CSV at `path`
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}-{hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]}-"
+
+
+def cache_path(path, schema=None, cache_dir=None, auto_categories=True):
+    # <stem>-<path hash>-<file version>-<format and schema hash>.arrow
+    schema_key = hashlib.sha256(json.dumps([FORMAT_VERSION, schema or {}, auto_categories], sort_keys=True).encode()).hexdigest()
+    return os.path.join(cache_dir or CACHE_DIR, f"{_cache_prefix(path)}{file_fingerprint(path)[:16]}-{schema_key[:8]}.arrow")
+
+
+def smallest_integer_type(column):
+    bounds = pc.min_max(column)
+    low, high = bounds['min'].as_py(), bounds['max'].as_py()
+    if low is None:
+        return column.type
+    for integer_type in INTEGER_TYPES:
+        info = np.iinfo(integer_type.to_pandas_dtype())
+        if info.min <= low and high <= info.max:
+            return integer_type
+    return column.type
+
+
+def compact_table(table, schema=None, auto_categories=True):
+    """
+    Apply the declared `schema` and the default downcasts to an Arrow table.
+    """
+    schema = schema or {}
+    columns = []
+    for name, column in zip(table.column_names, table.columns):
+        dtype = schema.get(name)
+        if dtype == 'category':
+            column = column.dictionary_encode()
+        elif dtype is not None:
+            column = column.cast(arrow_type(dtype))
+        elif pa.types.is_integer(column.type):
+            column = column.cast(smallest_integer_type(column))
+        elif pa.types.is_date(column.type):
+            column = column.cast(pa.timestamp('ns'))
+        elif auto_categories and (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+            distinct = pc.count_distinct(column).as_py() if len(column) else None
+            if distinct is not None and distinct <= min(CATEGORY_RATIO * len(column), MAX_CATEGORIES):
+                column = column.dictionary_encode()
+        columns.append(column)
+    table = pa.table(columns, names=table.column_names)
+    # One dictionary per column, so that the table can be written as an IPC file
+    return table.unify_dictionaries().combine_chunks()
+
+
+def convert_csv(path, destination, schema=None, auto_categories=True):
+    """
+    Parse `path` and write its compacted table to `destination` as an Arrow IPC file.
+    """
+    schema = schema or {}
+    column_types = {name: arrow_type(dtype) for name, dtype in schema.items() if dtype not in ('category', 'datetime')}
+    table = pa_csv.read_csv(path, convert_options=pa_csv.ConvertOptions(column_types=column_types,
+                                                                         strings_can_be_null=True))
+    table = compact_table(table, schema, auto_categories)
+
+    # Write next to the destination and rename, so readers never see a partial file
+    directory = os.path.dirname(destination) or '.'
+    os.makedirs(directory, exist_ok=True)
+    handle, partial = tempfile.mkstemp(dir=directory, suffix='.partial')
+    try:
+        with os.fdopen(handle, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(partial, destination)
+    except BaseException:
+        os.remove(partial)
+        raise
+
+    # Drop entries for earlier versions of the same file
+    version = os.path.basename(destination).split('-')[-2]
+    entry = re.compile(re.escape(_cache_prefix(path)) + r'([0-9a-f]{16})-[0-9a-f]{8}\.arrow')
+    for name in os.listdir(directory):
+        match = entry.fullmatch(name)
+        if match and match.group(1) != version:
+            os.remove(os.path.join(directory, name))
+    return table.num_rows
+
+
+def read_cached(cache_file, columns=None):
+    """
+    Memory-map a cached table and convert `columns` (default: all) to a pandas DataFrame.
+    """
+    table = pa.ipc.open_file(pa.memory_map(cache_file)).read_all()
+    if columns is not None:
+        table = table.select(list(columns))
+    return table.to_pandas(split_blocks=True)
+
+
+def load_csv(path, columns=None, schema=None, auto_categories=True, cache_dir=None):
+    """
+    Load `columns` (default: all) of the CSV file at `path` with compact dtypes, converting it to the columnar
+    cache on first use or after the file changes.
+    """
+    cache_file = cache_path(path, schema, cache_dir, auto_categories)
+    hit = os.path.exists(cache_file)
+    instrumentation.count_cache('columnar_cache', hit)
+    if not hit:
+        with instrumentation.stage('columnar_cache.convert'):
+            convert_csv(path, cache_file, schema, auto_categories)
+        instrumentation.count_bytes('columnar_cache.convert', os.path.getsize(path), direction='in')
+    return read_cached(cache_file, columns)
@@ -1,20 +1,67 @@
 """
-This example defines a FastAPI app and adds a single route at /data_quality_checks/ that expects a CSV file in the request body. 
+This example defines a FastAPI app and adds a single route at /data_quality_checks/ that expects a CSV file upload.
+The upload is streamed to a spooled temporary file, parsed and checked in a worker thread so the event loop keeps
+serving other requests, and the results are rendered as HTML or returned as JSON (`?format=json` or `Accept: application/json`).
+The checks run as a compiled rule plan (see dq_rules); `?rules=<feed>` selects a JSON/YAML rule spec from RULES_DIR.
+
+For large files, POST /jobs/ queues the checks on a bounded background worker pool and returns a job id immediately.
+Clients poll GET /jobs/{job_id} or subscribe to GET /jobs/{job_id}/events (server-sent events). Results are cached
+by the content hash of the uploaded file and the hash of the compiled rule spec, so re-submitting identical data
+returns the existing job until the rules change.
+
+GET /metrics exposes the instrumentation metrics (request and stage latencies, rows and bytes read) in the
+Prometheus text format, or as JSON with `?format=json`; recording is enabled with ICU_METRICS=1. `?profile=true` on
+/data_quality_checks/ or /jobs/ runs that one request or job under the sampling profiler and adds its hottest
+functions to the response (a profiled request is always answered with JSON) or to the job status.
 """
+import asyncio
+import json
+import os
+import re
+import time
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, File, UploadFile, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
+import instrumentation
+from dq_jobs import FINISHED, JobManager, spool_upload
+from dq_rules import compile_rules, load_rules
+
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
 
+# Worker threads that parse uploads and run the checks off the event loop
+CHECK_WORKERS = int(os.environ.get('DQ_CHECK_WORKERS', os.cpu_count() or 1))
+check_executor = ThreadPoolExecutor(max_workers=CHECK_WORKERS, thread_name_prefix='dq-check')
+
+# Rows parsed per chunk while reading an upload
+CSV_CHUNK_SIZE = 100_000
+
+# Background workers and retained jobs for the /jobs/ API
+JOB_WORKERS = int(os.environ.get('DQ_JOB_WORKERS', 2))
+MAX_JOBS = int(os.environ.get('DQ_MAX_JOBS', 256))
+
+# The default rule set; the thresholds used by the individual checks are read from it
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules', 'default.json')
+with open(DEFAULT_RULES_PATH) as rules_file:
+    DEFAULT_RULES = json.load(rules_file)
+
+ACCURACY_RANGE = tuple(DEFAULT_RULES['dataset']['numeric_range'])
+DATE_COLUMN = DEFAULT_RULES['dataset']['freshness']['column']
+TIMELINESS_DAYS = DEFAULT_RULES['dataset']['freshness']['max_age_days']
+EXPECTED_COLUMNS = DEFAULT_RULES['dataset']['expected_columns']
+VALIDITY_RANGES = {col: tuple(rules['range']) for col, rules in DEFAULT_RULES['columns'].items() if 'range' in rules}
+EXPECTED_DECIMAL_PLACES = {col: rules['precision'] for col, rules in DEFAULT_RULES['columns'].items()
+                           if 'precision' in rules}
+
 def check_accuracy(df):
     # Check for accuracy by ensuring that all data is within acceptable ranges
-    # Here we assume that all columns are numeric
-    for col in df.columns:
-        if df[col].max() > 100 or df[col].min() < 0:
+    # Only numeric columns are range-checked (e.g. the date column is skipped)
+    for col in df.select_dtypes(include='number').columns:
+        if df[col].max() > ACCURACY_RANGE[1] or df[col].min() < ACCURACY_RANGE[0]:
             return False
     return True
 
@@ -29,24 +76,22 @@ def check_consistency(df):
 def check_timeliness(df):
     # Check for timeliness by ensuring that the data is not older than 30 days
     today = datetime.now()
-    data_date = df['date_column'].max() # assuming a date column exists
-    return (today - data_date).days < 30
+    data_date = df[DATE_COLUMN].max() # assuming a date column exists
+    return (today - data_date).days < TIMELINESS_DAYS
 
 def check_relevance(df):
     # Check for relevance by ensuring that the dataset contains the expected columns
-    expected_columns = ['col1', 'col2', 'col3']
-    return set(df.columns) == set(expected_columns)
+    return set(df.columns) == set(EXPECTED_COLUMNS)
 
 def check_validity(df):
     # Check for validity by ensuring that all values are within acceptable ranges
     # Here we assume that column 'col1' should have values between 0 and 10
-    return df['col1'].between(0, 10).all()
+    return all(df[col].between(low, high).all() for col, (low, high) in VALIDITY_RANGES.items())
 
 def check_precision(df):
     # Check for precision by ensuring that all columns have the expected number of decimal places
-    expected_decimal_places = {'col1': 2, 'col2': 3}
-    for col in expected_decimal_places:
-        if df[col].apply(lambda x: len(str(x).split('.')[1])).max() != expected_decimal_places[col]:
+    for col in EXPECTED_DECIMAL_PLACES:
+        if df[col].apply(lambda x: len(str(x).split('.')[1])).max() != EXPECTED_DECIMAL_PLACES[col]:
             return False
     return True
 
@@ -54,8 +99,65 @@ def check_uniqueness(df):
     # Check for uniqueness by ensuring that there are no duplicate rows in the dataset
     return len(df) == len(df.drop_duplicates())
 
+CHECK_NAMES = ['accuracy', 'completeness', 'consistency', 'timeliness', 'relevance', 'validity', 'precision', 'uniqueness']
+
+# Fused check engine: the default rule set is compiled once by dq_rules into a plan
+# that computes the column statistics in one pass and derives the eight verdicts from them.
+# Where an individual check would raise (a missing column, missing values in a precision column) the verdict is False.
+# Other ICU feeds can be validated with their own rule specs in RULES_DIR, selected with `?rules=<feed name>`.
+
+RULES_DIR = os.environ.get('DQ_RULES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules'))
+
+def get_rule_plan(rules=None):
+    # Compiled plan for the named rule spec in RULES_DIR, or for the default rules
+    if rules is None:
+        return compile_rules(DEFAULT_RULES)
+    if not re.fullmatch(r'[A-Za-z0-9_-]+', rules):
+        raise HTTPException(status_code=400, detail=f"Invalid rule set name {rules!r}")
+    for extension in ('.json', '.yaml', '.yml'):
+        path = os.path.join(RULES_DIR, rules + extension)
+        if os.path.exists(path):
+            return load_rules(path)
+    raise HTTPException(status_code=404, detail=f"Unknown rule set {rules!r}")
+
+def run_fused_checks(df, plan=None):
+    # Return {check: verdict} and {stage: seconds} for the statistics pass and each check
+    verdicts, timings, _ = (plan or get_rule_plan()).evaluate(df)
+    return verdicts, timings
+
+def read_csv_upload(file, date_columns=(DATE_COLUMN,)):
+    # Parse the uploaded CSV incrementally from its spooled file
+    chunks = pd.read_csv(file, chunksize=CSV_CHUNK_SIZE)
+    df = pd.concat(chunks, ignore_index=True)
+    # The timeliness checks compare against a datetime; an unparseable date becomes NaT and fails the checks
+    for column in date_columns:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+    return df
+
+def check_uploaded_file(file, plan=None):
+    # Load the upload and run all checks; runs in a worker thread
+    plan = plan or get_rule_plan()
+    with instrumentation.stage('dq.read'):
+        df = read_csv_upload(file, plan.date_columns)
+    if instrumentation.is_enabled():
+        instrumentation.count_rows('dq.read', len(df))
+        instrumentation.count_bytes('dq.read', file.tell(), direction='in')
+    with instrumentation.stage('dq.checks'):
+        verdicts, timings = run_fused_checks(df, plan)
+    return [{'check_number': i+1, 'check': name, 'result': 'Passed' if verdicts[name] else 'Failed', 'seconds': timings[name]}
+            for i, name in enumerate(CHECK_NAMES)]
+
+def wants_json(request, format):
+    return format == 'json' or 'application/json' in request.headers.get('accept', '')
+
 def run_data_quality_checks(df):
-    # Run all data quality checks and return a list of results
+    # Run all data quality checks with the fused engine and return a list of results
+    verdicts, _ = run_fused_checks(df)
+    return [verdicts[name] for name in CHECK_NAMES]
+
+def run_data_quality_checks_individually(df):
+    # Run each data quality check on its own and return a list of results
     results = []
     results.append(check_accuracy(df))
     results.append(check_completeness(df))
@@ -67,22 +169,100 @@ def run_data_quality_checks(df):
     results.append(check_uniqueness(df))
     return results
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    # Latency per method and route template (not the raw path, so job ids do not become separate series)
+    if not instrumentation.is_enabled():
+        return await call_next(request)
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    instrumentation.observe(f"http {request.method} {route.path if route else 'unmatched'}", time.perf_counter() - start)
+    return response
+
+@app.get("/metrics")
+async def metrics(format: str = 'prometheus'):
+    if format == 'json':
+        return JSONResponse(instrumentation.to_dict())
+    return PlainTextResponse(instrumentation.prometheus_text(), media_type=instrumentation.PROMETHEUS_CONTENT_TYPE)
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     # Render home page template
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.post("/data_quality_checks/")
-async def data_quality_checks(request: Request, file: bytes = Form(...)):
-    # Load data and run data quality checks
-    df = pd.read_csv(file)
-    results = run_data_quality_checks(df)
-    
-    # Prepare response
-    response = []
-    for i, result in enumerate(results):
-        response.append({'check_number': i+1, 'result': 'Passed' if result else 'Failed'})
-    
+async def data_quality_checks(request: Request, file: UploadFile = File(...), format: str = 'html', rules: str = None,
+                              profile: bool = False):
+    # Load data and run data quality checks in a worker thread without blocking the event loop
+    plan = get_rule_plan(rules)
+    loop = asyncio.get_running_loop()
+    profiler = None
+    try:
+        if profile:
+            response, profiler = await loop.run_in_executor(check_executor, instrumentation.run_profiled,
+                                                            check_uploaded_file, file.file, plan)
+        else:
+            response = await loop.run_in_executor(check_executor, check_uploaded_file, file.file, plan)
+    finally:
+        await file.close()
+
+    if wants_json(request, format) or profiler is not None:
+        return JSONResponse({'filename': file.filename, 'results': response,
+                             **({'profile': profiler.to_dict()} if profiler is not None else {})})
+
     # Render results page template
     return templates.TemplateResponse("results.html", {"request": request, "results": response})
 
+# Background jobs for large files
+
+job_manager = JobManager(run_job=check_uploaded_file, max_workers=JOB_WORKERS, max_jobs=MAX_JOBS)
+
+def job_urls(request, job):
+    return {
+        'status_url': str(request.url_for('job_status', job_id=job.id)),
+        'events_url': str(request.url_for('job_events', job_id=job.id)),
+    }
+
+@app.post("/jobs/", status_code=202)
+async def submit_job(request: Request, file: UploadFile = File(...), rules: str = None, profile: bool = False):
+    # Spool and hash the upload, then queue the checks (or reuse the job for identical content and rules)
+    plan = get_rule_plan(rules)
+    try:
+        path, content_hash = await spool_upload(file)
+    finally:
+        await file.close()
+    # Keyed by the rule spec's content rather than its name, so an edited rule file does not return stale results;
+    # a profiled run is keyed separately, so asking for a profile never returns a cached job without one
+    job = job_manager.submit(path, content_hash, filename=file.filename, options={'plan': plan}, profile=profile,
+                             cache_key=f"{content_hash}:{plan.spec_hash}{':profile' if profile else ''}")
+    return {'job_id': job.id, 'status': job.status, **job_urls(request, job)}
+
+def get_job_or_404(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job
+
+@app.get("/jobs/{job_id}")
+async def job_status(request: Request, job_id: str):
+    job = get_job_or_404(job_id)
+    return {**job.to_dict(), **job_urls(request, job)}
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, poll_interval: float = 0.5):
+    # Server-sent events: one `status` event per status change, ending once the job has finished
+    job = get_job_or_404(job_id)
+
+    async def events():
+        last_status = None
+        while True:
+            status = job.status
+            if status != last_status:
+                last_status = status
+                yield f"event: status\ndata: {json.dumps(job.to_dict())}\n\n"
+            if status in FINISHED:
+                break
+            await asyncio.sleep(poll_interval)
+
+    return StreamingResponse(events(), media_type='text/event-stream')
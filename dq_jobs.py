@@ -0,0 +1,153 @@
+"""
+In-process job queue for long data quality runs.
+
+Uploaded files are spooled to disk and hashed while they are received. `JobManager.submit` returns a job
+immediately and a bounded pool of worker threads runs the checks in the background. Jobs are keyed by the
+content hash of their file, so re-submitting identical data returns the existing job (and its cached result)
+instead of running the checks again. No external broker is needed. A job submitted with `profile=True` runs under
+the sampling profiler and reports its hottest functions with the result.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+FINISHED = (DONE, FAILED)
+
+
+class Job:
+    def __init__(self, content_hash, filename=None, cache_key=None, profile=False):
+        self.id = uuid.uuid4().hex
+        self.content_hash = content_hash
+        self.cache_key = cache_key or content_hash
+        self.filename = filename
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.profile = {} if profile else None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.finished = threading.Event()
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'filename': self.filename,
+            'content_hash': self.content_hash,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result,
+            'error': self.error,
+            **({'profile': self.profile} if self.profile is not None else {}),
+        }
+
+
+def _spool_chunk(spool, digest, chunk):
+    digest.update(chunk)
+    spool.write(chunk)
+
+
+async def spool_upload(upload, directory=None, chunk_size=1 << 20, executor=None):
+    """
+    Copy an UploadFile to a temporary file in chunks, hashing it on the way.
+    Hashing and writing run on `executor` (the loop's default executor if None), not on the event loop.
+    Returns (path, sha256 hex digest).
+    """
+    loop = asyncio.get_running_loop()
+    digest = hashlib.sha256()
+    handle, path = tempfile.mkstemp(suffix='.csv', dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as spool:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                await loop.run_in_executor(executor, _spool_chunk, spool, digest, chunk)
+    except BaseException:
+        # A failed or cancelled upload leaves no temporary file behind
+        os.unlink(path)
+        raise
+    return path, digest.hexdigest()
+
+
+class JobManager:
+    """
+    Runs `run_job(file, **options)` for submitted files on `max_workers` background threads and keeps up to
+    `max_jobs` jobs (oldest finished ones are forgotten first).
+    """
+    def __init__(self, run_job, max_workers=2, max_jobs=256):
+        self.run_job = run_job
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dq-job')
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, path, content_hash, filename=None, options=None, cache_key=None, profile=False):
+        """
+        Queue `run_job(file, **options)` for the spooled file at `path`, which the manager deletes once it is no
+        longer needed. Returns the existing job if the same `cache_key` (by default the content hash) was already
+        submitted and has not failed. With `profile`, the job runs under the sampling profiler.
+        """
+        cache_key = cache_key or content_hash
+        with self._lock:
+            existing = self._jobs.get(self._by_key.get(cache_key))
+            if existing is not None and existing.status != FAILED:
+                os.remove(path)
+                return existing
+            job = Job(content_hash, filename, cache_key, profile)
+            self._jobs[job.id] = job
+            self._by_key[cache_key] = job.id
+            self._evict()
+        self._executor.submit(self._run, job, path, options or {})
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def _run(self, job, path, options):
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            with open(path, 'rb') as file, instrumentation.stage('dq.job'):
+                if job.profile is None:
+                    job.result = self.run_job(file, **options)
+                else:
+                    job.result, profiler = instrumentation.run_profiled(self.run_job, file, **options)
+                    job.profile = profiler.to_dict()
+            job.status = DONE
+        except Exception as error:
+            job.error = f"{type(error).__name__}: {error}"
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            job.finished.set()
+            os.remove(path)
+
+    def _evict(self):
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            job = self._jobs[job_id]
+            if job.status in FINISHED:
+                del self._jobs[job_id]
+                if self._by_key.get(job.cache_key) == job_id:
+                    del self._by_key[job.cache_key]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
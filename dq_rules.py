@@ -0,0 +1,273 @@
+"""
+Declarative rule sets for the data quality checks.
+
+A rule spec is a JSON or YAML document such as:
+
+    name: icu_vitals
+    dataset:
+      expected_columns: [patient_id, heart_rate, temperature, charted_at]   # relevance
+      allow_extra_columns: false
+      numeric_range: [0, 100000]                                           # accuracy, every numeric column
+      complete: true                                                       # completeness, no missing values
+      uniform_dtypes: false                                                # consistency, one dtype for all columns
+      freshness: {column: charted_at, max_age_days: 1}                     # timeliness
+      unique_rows: true                                                    # uniqueness
+    columns:
+      heart_rate: {type: number, range: [20, 250], not_null: true}
+      temperature: {type: float, range: [30, 45], precision: 1}
+      patient_id: {unique: true}
+
+Column rules are `type` (int, float, number, str, datetime or bool; consistency), `range` (validity),
+`precision` (decimal places printed by str(); precision), `not_null` (completeness) and `unique` (uniqueness).
+
+`compile_rules` turns a spec into a `RulePlan` of vectorized evaluators once; plans are cached by the spec's
+content, and `load_rules` caches parsed files by path and modification time, so rules are neither re-parsed nor
+re-interpreted per request or per row. `RulePlan.spec_hash` identifies the spec a plan was compiled from, and
+`RulePlan.date_columns` lists the columns it reads as dates (the freshness column and columns of type datetime), for
+readers that parse them. A rule that cannot apply to a column (e.g. a numeric range on text) fails rather than raising. `RulePlan.evaluate` computes the shared column statistics once and returns a
+verdict per check category (the eight checks of the FastAPI service) plus per-rule results and timings.
+"""
+import functools
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+CHECK_CATEGORIES = ['accuracy', 'completeness', 'consistency', 'timeliness', 'relevance', 'validity', 'precision', 'uniqueness']
+
+COLUMN_TYPES = {
+    'int': pd.api.types.is_integer_dtype,
+    'float': pd.api.types.is_float_dtype,
+    'number': pd.api.types.is_numeric_dtype,
+    'str': lambda dtype: pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype),
+    'datetime': pd.api.types.is_datetime64_any_dtype,
+    'bool': pd.api.types.is_bool_dtype,
+}
+
+DATASET_KEYS = {'expected_columns', 'allow_extra_columns', 'numeric_range', 'complete', 'uniform_dtypes', 'freshness', 'unique_rows'}
+COLUMN_KEYS = {'type', 'range', 'precision', 'not_null', 'unique'}
+
+
+def column_statistics(df):
+    """
+    Per-column minimum, maximum and missing counts in one reduction per statistic.
+    """
+    numeric = df.select_dtypes(include='number')
+    return {'min': numeric.min(), 'max': numeric.max(), 'missing': df.isnull().sum()}
+
+
+def has_decimal_places(values, expected):
+    """
+    Whether the largest number of decimal places printed by str() for the values equals `expected`.
+    """
+    if values.dtype.kind == 'f':
+        x = values.to_numpy()
+        if expected < 1 or np.isnan(x).any():
+            return False
+
+        def at_most(places):
+            # Values that round-trip through `places` decimal places have at most that many
+            scale = 10.0 ** places
+            return np.round(x * scale) / scale == x
+
+        # str() prints at least one decimal place for floats
+        return bool(at_most(expected).all() and (expected == 1 or not at_most(expected - 1).all()))
+    return values.astype(str).str.partition('.')[2].str.len().max() == expected
+
+
+class Rule:
+    def __init__(self, name, category, evaluate):
+        self.name = name
+        self.category = category
+        self.evaluate = evaluate
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, {self.category!r})"
+
+
+class RulePlan:
+    def __init__(self, name, rules, spec_hash=None, date_columns=()):
+        self.name = name
+        self.rules = rules
+        # SHA-256 of the canonical JSON of the compiled spec
+        self.spec_hash = spec_hash
+        self.date_columns = list(date_columns)
+
+    def evaluate(self, df):
+        """
+        Evaluate every rule against `df`.
+        Returns ({category: verdict}, {stage: seconds}, {rule name: verdict}); a category without rules passes.
+        """
+        timings = {}
+        start = time.perf_counter()
+        stats = column_statistics(df)
+        timings['statistics'] = time.perf_counter() - start
+
+        rule_results = {}
+        verdicts = dict.fromkeys(CHECK_CATEGORIES, True)
+        for category in CHECK_CATEGORIES:
+            timings[category] = 0.0
+        for rule in self.rules:
+            start = time.perf_counter()
+            passed = bool(rule.evaluate(df, stats))
+            timings[rule.category] += time.perf_counter() - start
+            rule_results[rule.name] = passed
+            verdicts[rule.category] = verdicts[rule.category] and passed
+        return verdicts, timings, rule_results
+
+
+def _accuracy_rule(low, high):
+    def evaluate(df, stats):
+        return not ((stats['max'] > high) | (stats['min'] < low)).any()
+    return evaluate
+
+
+def _relevance_rule(expected_columns, allow_extra_columns):
+    expected = set(expected_columns)
+
+    def evaluate(df, stats):
+        columns = set(df.columns)
+        return expected <= columns if allow_extra_columns else columns == expected
+    return evaluate
+
+
+def _freshness_rule(column, max_age_days):
+    def evaluate(df, stats):
+        if column not in df.columns:
+            return False
+        values = df[column]
+        if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+            values = pd.to_datetime(values, errors='coerce')
+        latest = values.max()
+        return not pd.isna(latest) and (datetime.now() - latest).days < max_age_days
+    return evaluate
+
+
+def _unique_rows_rule(df, stats):
+    # Hash each row instead of materializing a deduplicated copy
+    return not pd.util.hash_pandas_object(df, index=False).duplicated().any()
+
+
+def _type_rule(column, type_name):
+    is_type = COLUMN_TYPES[type_name]
+
+    def evaluate(df, stats):
+        return column in df.columns and is_type(df[column].dtype)
+    return evaluate
+
+
+def _range_rule(column, low, high):
+    def evaluate(df, stats):
+        if column in stats['min']:
+            return stats['missing'][column] == 0 and stats['min'][column] >= low and stats['max'][column] <= high
+        # Not in the numeric statistics: a boolean column is compared as 0/1, any other column fails
+        if column not in df.columns or not pd.api.types.is_numeric_dtype(df[column].dtype):
+            return False
+        return bool(df[column].between(low, high).all())
+    return evaluate
+
+
+def _precision_rule(column, places):
+    def evaluate(df, stats):
+        return column in df.columns and has_decimal_places(df[column], places)
+    return evaluate
+
+
+def _not_null_rule(column):
+    def evaluate(df, stats):
+        return column in df.columns and stats['missing'][column] == 0
+    return evaluate
+
+
+def _unique_rule(column):
+    def evaluate(df, stats):
+        return column in df.columns and not df[column].duplicated().any()
+    return evaluate
+
+
+def _compile(spec, spec_hash=None):
+    dataset = spec.get('dataset', {})
+    columns = spec.get('columns', {})
+    unknown = set(dataset) - DATASET_KEYS
+    if unknown:
+        raise ValueError(f"Unknown dataset rules: {sorted(unknown)}")
+
+    rules = []
+    date_columns = []
+    if 'numeric_range' in dataset:
+        low, high = dataset['numeric_range']
+        rules.append(Rule('numeric_range', 'accuracy', _accuracy_rule(low, high)))
+    if dataset.get('complete'):
+        rules.append(Rule('complete', 'completeness', lambda df, stats: stats['missing'].sum() == 0))
+    if dataset.get('uniform_dtypes'):
+        rules.append(Rule('uniform_dtypes', 'consistency', lambda df, stats: len(set(df.dtypes)) == 1))
+    if 'freshness' in dataset:
+        freshness = dataset['freshness']
+        date_columns.append(freshness['column'])
+        rules.append(Rule('freshness', 'timeliness', _freshness_rule(freshness['column'], freshness['max_age_days'])))
+    if 'expected_columns' in dataset:
+        rules.append(Rule('expected_columns', 'relevance',
+                          _relevance_rule(dataset['expected_columns'], dataset.get('allow_extra_columns', False))))
+    if dataset.get('unique_rows'):
+        rules.append(Rule('unique_rows', 'uniqueness', _unique_rows_rule))
+
+    for column, column_rules in columns.items():
+        column_rules = column_rules or {}
+        unknown = set(column_rules) - COLUMN_KEYS
+        if unknown:
+            raise ValueError(f"Unknown rules for column {column!r}: {sorted(unknown)}")
+        if 'type' in column_rules:
+            if column_rules['type'] not in COLUMN_TYPES:
+                raise ValueError(f"Unknown type {column_rules['type']!r} for column {column!r}")
+            rules.append(Rule(f"{column}.type", 'consistency', _type_rule(column, column_rules['type'])))
+            if column_rules['type'] == 'datetime' and column not in date_columns:
+                date_columns.append(column)
+        if 'range' in column_rules:
+            low, high = column_rules['range']
+            rules.append(Rule(f"{column}.range", 'validity', _range_rule(column, low, high)))
+        if 'precision' in column_rules:
+            rules.append(Rule(f"{column}.precision", 'precision', _precision_rule(column, column_rules['precision'])))
+        if column_rules.get('not_null'):
+            rules.append(Rule(f"{column}.not_null", 'completeness', _not_null_rule(column)))
+        if column_rules.get('unique'):
+            rules.append(Rule(f"{column}.unique", 'uniqueness', _unique_rule(column)))
+
+    return RulePlan(spec.get('name', 'rules'), rules, spec_hash, date_columns)
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_cached(canonical_spec):
+    return _compile(json.loads(canonical_spec), hashlib.sha256(canonical_spec.encode()).hexdigest())
+
+
+def compile_rules(spec):
+    """
+    Compile a rule spec (a dict) into a `RulePlan`; identical specs share one cached plan.
+    """
+    return _compile_cached(json.dumps(spec, sort_keys=True))
+
+
+@functools.lru_cache(maxsize=64)
+def _read_spec(path, mtime):
+    with open(path) as file:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise ImportError("PyYAML is required to read YAML rule specs")
+            return yaml.safe_load(file)
+        return json.load(file)
+
+
+def load_rules(path):
+    """
+    Load and compile the rule spec at `path` (.json, .yaml or .yml), re-reading it only when the file changes.
+    """
+    return compile_rules(_read_spec(path, os.path.getmtime(path)))
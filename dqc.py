@@ -1,11 +1,22 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
 import pandas as pd
 import numpy as np
 
+import instrumentation
+from columnar_cache import load_csv
+from dq_rules import load_rules
+from sketches import HashSet, HyperLogLog, hash_values
+
+@instrumentation.timed('dqc.load')
 def load_data(file_path):
     """
-    Load data from a CSV file using pandas.
+    Load data from a CSV file through the columnar cache (compact dtypes, parsed once per file version).
     """
-    df = pd.read_csv(file_path)
+    df = load_csv(file_path)
     return df
 
 def check_missing_values(df):
@@ -20,12 +31,21 @@ def check_duplicates(df):
     """
     return df.duplicated().sum()
 
+def find_inconsistent_groups(df, group_columns, check_columns):
+    """
+    Find the groups in which a check column takes more than one value (missing counts as a value),
+    checking all the columns against the same grouping in one hash-based groupby pass.
+    Returns a boolean DataFrame indexed by the offending group keys with one column per check column.
+    """
+    distinct = df.groupby(list(group_columns), sort=False, observed=True)[list(check_columns)].nunique(dropna=False)
+    inconsistent = distinct > 1
+    return inconsistent[inconsistent.any(axis=1)]
+
 def check_consistency(df, group_columns, check_column):
     """
     Check for consistency in the dataset using pandas.
     """
-    group_data = df.groupby(list(group_columns))[check_column].apply(list).reset_index()
-    return group_data.apply(lambda row: len(set(row[check_column])) > 1, axis=1).sum()
+    return int(find_inconsistent_groups(df, group_columns, [check_column])[check_column].sum())
 
 def check_accuracy_validity(df, column):
     """
@@ -51,6 +71,277 @@ def check_cardinality(df, column):
     low_cardinality = cardinality < 0.01 * len(df)
     return high_cardinality, low_cardinality
 
+def consistency_groupings(columns):
+    """
+    Map each grouping used by the consistency check to the columns checked against it.
+    Most columns share the first two columns as their grouping, so there are at most three groupings;
+    a single-column dataset has the empty grouping.
+    """
+    groupings = {}
+    for column in columns:
+        group_columns = tuple(other for other in columns if other != column)[:2]
+        groupings.setdefault(group_columns, []).append(column)
+    return groupings
+
+def column_bounds(values):
+    """
+    Minimum and maximum of the non-missing values of a column, or (None, None) if they cannot be ordered.
+    Categorical columns are ordered by their values, from the categories that occur.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = pd.Series(values.cat.remove_unused_categories().cat.categories)
+    elif values.dtype == object:
+        # Before pandas 3, min() of an object column does not skip None
+        values = values.dropna()
+    try:
+        return values.min(), values.max()
+    except TypeError:
+        return None, None
+
+def profile_results(n_rows, missing, distinct, minimum, maximum, consistency):
+    """
+    Assemble the per-column profile from merged column statistics.
+    """
+    non_null = n_rows - missing
+
+    # Duplicated values, counting repeated missing values as duplicates like `Series.duplicated`
+    duplicates = n_rows - distinct - (missing > 0)
+
+    # Every non-missing value lies within the column's own [min, max] range,
+    # and every value (missing included) is among the column's unique values
+    accuracy_count = non_null.where(minimum.notna(), 0)
+    validity_count = pd.Series(n_rows, index=missing.index)
+
+    percent = 100 / n_rows if n_rows else np.nan
+    return pd.DataFrame({
+        "Missing Values": missing,
+        "Duplicates": duplicates,
+        "Distinct Values": distinct,
+        "Min": minimum,
+        "Max": maximum,
+        "High Cardinality": distinct > n_rows / 2,
+        "Low Cardinality": distinct < 0.01 * n_rows,
+        "Consistency Issues": consistency,
+        "Accuracy Count": accuracy_count,
+        "Accuracy Percentage": accuracy_count * percent,
+        "Validity Count": validity_count,
+        "Validity Percentage": validity_count * percent,
+    }, index=missing.index)
+
+def is_number(dtype):
+    # The dtypes DataFrame.select_dtypes(include='number') selects
+    return (pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)) \
+        or pd.api.types.is_timedelta64_dtype(dtype)
+
+def column_statistics(df, columns, group_columns):
+    """
+    Missing, distinct, min, max and consistency statistics of `columns`, checking consistency
+    against `group_columns` in one groupby pass.
+    Statistics are computed one column at a time: selecting or reducing several columns of `df` at once would copy
+    them into a new 2-D block (before pandas 3), and in a worker those columns are views of shared memory.
+    """
+    columns = list(columns)
+    numeric = [column for column in columns if is_number(df[column].dtype)]
+    minimum = pd.Series({column: df[column].min() for column in numeric}, dtype=None if numeric else object)
+    maximum = pd.Series({column: df[column].max() for column in numeric}, dtype=None if numeric else object)
+    minimum = minimum.reindex(columns).astype(object)
+    maximum = maximum.reindex(columns).astype(object)
+    for column in columns:
+        if column not in numeric:
+            minimum[column], maximum[column] = column_bounds(df[column])
+
+    consistency = pd.Series(0, index=columns, dtype='int64')
+    if group_columns:
+        consistency[:] = find_inconsistent_groups(df, group_columns, columns).sum()
+
+    return pd.DataFrame({
+        'missing': pd.Series({column: df[column].isnull().sum() for column in columns}, dtype='int64'),
+        'distinct': pd.Series({column: df[column].nunique() for column in columns}, dtype='int64'),
+        'minimum': minimum,
+        'maximum': maximum,
+        'consistency': consistency,
+    }, index=columns)
+
+@instrumentation.timed('dqc.profile')
+def profile_data(df, n_jobs=1):
+    """
+    Profile every column in a few vectorized passes over the DataFrame using pandas.
+    Returns a DataFrame indexed by column with the fields reported by `print_data_quality_results`
+    plus the distinct count, minimum and maximum of each column.
+    With `n_jobs` > 1 (None for all cores) columns are profiled by a pool of worker processes.
+    """
+    n_jobs = n_jobs or os.cpu_count()
+    instrumentation.count_rows('dqc.profile', len(df))
+
+    # One task per grouping, split into `n_jobs` batches of columns for the worker processes
+    tasks = [(group_columns, list(batch))
+             for group_columns, check_columns in consistency_groupings(df.columns).items()
+             for batch in np.array_split(np.asarray(check_columns, dtype=object), min(n_jobs, len(check_columns)))]
+
+    if n_jobs == 1:
+        statistics = [column_statistics(df, columns, group_columns) for group_columns, columns in tasks]
+    else:
+        statistics = parallel_column_statistics(df, tasks, n_jobs)
+    statistics = pd.concat(statistics).reindex(df.columns)
+
+    return profile_results(len(df), statistics['missing'].astype('int64'), statistics['distinct'].astype('int64'),
+                           statistics['minimum'], statistics['maximum'], statistics['consistency'].astype('int64'))
+
+def column_codes(values):
+    """
+    Integer codes (-1 for missing) and the CategoricalDtype that maps them back to the values of a column.
+    Categorical columns keep their own categories; other columns are factorized.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(), values.dtype
+    codes, uniques = pd.factorize(values)
+    return codes, pd.CategoricalDtype(uniques)
+
+def share_columns(df):
+    """
+    Copy every column of `df` into one shared memory block: NumPy numeric, boolean and datetime columns as they are,
+    any other column (object, string, categorical, nullable) as the integer codes of `column_codes`.
+    Returns the block, a (column, dtype, offset) layout for `attach_shared_columns` and the CategoricalDtype
+    of each coded column.
+    """
+    arrays, categories = {}, {}
+    for column, dtype in df.dtypes.items():
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biufmM':
+            arrays[column] = df[column].to_numpy()
+        else:
+            arrays[column], categories[column] = column_codes(df[column])
+    layout, offset = [], 0
+    for column, array in arrays.items():
+        layout.append((column, array.dtype.str, offset))
+        offset += -(-array.nbytes // 8) * 8
+    block = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for column, dtype, offset in layout:
+        np.ndarray(len(df), dtype=dtype, buffer=block.buf, offset=offset)[:] = arrays[column]
+    return block, layout, categories
+
+def attach_shared_columns(block, layout, n_rows, columns, categories=None):
+    """
+    Zero-copy views of the shared `columns` listed in `layout`: NumPy arrays, or Categoricals over the shared codes
+    for the columns in `categories`.
+    """
+    categories = categories or {}
+    data = {}
+    for column, dtype, offset in layout:
+        if column in columns:
+            data[column] = np.ndarray(n_rows, dtype=dtype, buffer=block.buf, offset=offset)
+            if column in categories:
+                data[column] = pd.Categorical.from_codes(data[column], dtype=categories[column])
+    return data
+
+def _column_statistics_task(block_name, layout, n_rows, columns, group_columns, categories, order):
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        data = attach_shared_columns(block, layout, n_rows, set(order), categories)
+        frame = pd.DataFrame({column: data[column] for column in order}, copy=False)
+        statistics = column_statistics(frame, columns, group_columns)
+        del data, frame
+        return statistics
+    finally:
+        block.close()
+
+def parallel_column_statistics(df, tasks, n_jobs):
+    """
+    Run `column_statistics` for each (group_columns, columns) task in a process pool.
+    All columns, group-by columns included, are shared with the workers through shared memory instead of being
+    pickled per task; a task only carries the categories of the coded columns it reads. Results come back in task
+    order.
+    """
+    block, layout, categories = share_columns(df)
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = []
+            for group_columns, columns in tasks:
+                order = list(group_columns) + [column for column in columns if column not in group_columns]
+                task_categories = {column: categories[column] for column in order if column in categories}
+                futures.append(pool.submit(_column_statistics_task, block.name, layout, len(df),
+                                           columns, group_columns, task_categories, order))
+            return [future.result() for future in futures]
+    finally:
+        block.close()
+        block.unlink()
+
+def merge_bounds(bounds, chunk_bounds):
+    """
+    Merge the (min, max) of a column over earlier chunks with those of a new chunk.
+    None marks a column whose values cannot be ordered.
+    """
+    if bounds is None or chunk_bounds[0] is None:
+        return None
+    if pd.isna(chunk_bounds[0]):
+        return bounds
+    if pd.isna(bounds[0]):
+        return chunk_bounds
+    try:
+        return min(bounds[0], chunk_bounds[0]), max(bounds[1], chunk_bounds[1])
+    except TypeError:
+        return None
+
+@instrumentation.timed('dqc.profile_csv')
+def profile_csv(file_path, chunksize=100_000, distinct='hll'):
+    """
+    Profile a CSV file that does not fit in memory by streaming it in chunks of `chunksize` rows and
+    merging partial results; returns the same DataFrame structure as `profile_data`.
+    Missing values, counts and min/max merge exactly. Distinct counts and duplicates come from a
+    HyperLogLog sketch (distinct='hll', constant memory) or exact value hashes (distinct='exact').
+    Consistency keeps the min and max value hash per group, so its memory grows with the number of groups.
+    """
+    sketch_types = {'hll': HyperLogLog, 'exact': HashSet}
+    if distinct not in sketch_types:
+        raise ValueError(f"distinct must be one of {list(sketch_types)}, got {distinct!r}")
+
+    columns = None
+    for chunk in pd.read_csv(file_path, chunksize=chunksize):
+        if columns is None:
+            columns = chunk.columns
+            n_rows = 0
+            missing = pd.Series(0, index=columns, dtype='int64')
+            bounds = {column: (np.nan, np.nan) for column in columns}
+            sketches = {column: sketch_types[distinct]() for column in columns}
+            groupings = consistency_groupings(columns)
+            hash_ranges = dict.fromkeys(groupings)
+
+        n_rows += len(chunk)
+        missing += chunk.isnull().sum()
+        for column in columns:
+            values = chunk[column]
+            sketches[column].add(values.dropna())
+            bounds[column] = merge_bounds(bounds[column], column_bounds(values))
+
+        # A group is inconsistent for a column when the smallest and largest value hashes differ
+        for group_columns, check_columns in groupings.items():
+            if not group_columns:
+                continue
+            hashes = pd.DataFrame({column: hash_values(chunk[column]) for column in check_columns}, index=chunk.index)
+            grouped = hashes.groupby([chunk[column] for column in group_columns], sort=False, observed=True)
+            partial = (grouped.min(), grouped.max())
+            if hash_ranges[group_columns] is not None:
+                levels = list(range(len(group_columns)))
+                low, high = hash_ranges[group_columns]
+                partial = (pd.concat([low, partial[0]]).groupby(level=levels, sort=False).min(),
+                           pd.concat([high, partial[1]]).groupby(level=levels, sort=False).max())
+            hash_ranges[group_columns] = partial
+
+    if columns is None:
+        return profile_data(pd.read_csv(file_path))
+
+    distinct_counts = pd.Series({column: sketches[column].count() for column in columns}, dtype='int64')
+    minimum = pd.Series({column: None if bounds[column] is None else bounds[column][0] for column in columns}, dtype=object)
+    maximum = pd.Series({column: None if bounds[column] is None else bounds[column][1] for column in columns}, dtype=object)
+    consistency = pd.Series(0, index=columns, dtype='int64')
+    for ranges in hash_ranges.values():
+        if ranges is None:
+            continue
+        low, high = ranges
+        consistency[low.columns] = (low != high).sum()
+
+    instrumentation.count_rows('dqc.profile_csv', n_rows)
+    return profile_results(n_rows, missing, distinct_counts, minimum, maximum, consistency)
+
 def print_data_quality_results(results_dict):
     """
     Print data quality results in a formatted way.
@@ -68,33 +359,29 @@ def print_data_quality_results(results_dict):
         print("Validity Percentage:", result["Validity Percentage"])
         print("\n")
 
-def main():
+def print_rule_results(rule_results):
+    """
+    Print the outcome of each rule of a rule spec.
+    """
+    for rule, passed in rule_results.items():
+        print(f"Rule {rule}:", "Passed" if passed else "Failed")
+
+def main(file_path="Suicide data.csv", rules_path=None):
     # Load the dataset
-    file_path = "Suicide data.csv"
     df = load_data(file_path)
 
-    # Dictionary to store data quality results
-    results_dict = {}
-
-    # Check for data quality for each column in the DataFrame
-    for column in df.columns:
-        results_dict[column] = {
-            "Missing Values": check_missing_values(df[column]),
-            "Duplicates": check_duplicates(df[column]),
-            "High Cardinality": check_cardinality(df, column)[0],
-            "Low Cardinality": check_cardinality(df, column)[1],
-            "Consistency Issues": check_consistency(df, group_columns=df.drop(column, axis=1).columns[:2], check_column=column),
-        }
-        
-        # Get accuracy and validity results
-        accuracy_count, accuracy_percent, validity_count, validity_percent = check_accuracy_validity(df, column)
-        results_dict[column]["Accuracy Count"] = accuracy_count
-        results_dict[column]["Accuracy Percentage"] = accuracy_percent
-        results_dict[column]["Validity Count"] = validity_count
-        results_dict[column]["Validity Percentage"] = validity_percent
+    # Profile all columns of the DataFrame at once
+    results = profile_data(df)
 
     # Print data quality results
-    print_data_quality_results(results_dict)
+    print_data_quality_results(results.to_dict(orient='index'))
+
+    # Validate the dataset against a declarative rule spec (see dq_rules)
+    if rules_path is not None:
+        _, _, rule_results = load_rules(rules_path).evaluate(df)
+        print_rule_results(rule_results)
 
 if __name__ == '__main__':
-    main()
+    # ICU_METRICS=1 ICU_METRICS_JSON=<path> dumps the stage timings, ICU_PROFILE_DIR=<dir> profiles the run
+    with instrumentation.job('dqc'):
+        main(*sys.argv[1:3])
@@ -1,5 +1,8 @@
 # Main ICU guidelines protocols:
 
+import numpy as np
+import pandas as pd
+
 def sepsis_protocol(patient_data):
     # Use SIRS criteria to identify patients with suspected sepsis
     sirs_score = 0
@@ -60,3 +63,54 @@ def glycemic_control_protocol(patient_data):
         return "Insulin infusion for glycemic control in progress"
     else:
         return "No insulin infusion required for glycemic control"
+
+
+# Batch evaluation of all protocols over many patients at once
+
+PROTOCOL_MESSAGES = {
+    'sepsis': ("No sepsis suspected", "Sepsis suspected"),
+    'shock': ("No hypotension/shock suspected", "Hypotension/shock suspected"),
+    'ventilator': ("Lung protective ventilation strategy not required", "Lung protective ventilation strategy in use"),
+    'pain_management': ("No pain management required", "Pain management in progress"),
+    'glycemic_control': ("No insulin infusion required for glycemic control", "Insulin infusion for glycemic control in progress"),
+}
+
+PROTOCOL_FIELDS = ['temperature', 'heart_rate', 'respiratory_rate', 'white_blood_cells',
+                   'systolic_bp', 'diastolic_bp', 'weight', 'peak_pressure', 'peep',
+                   'pain_score', 'glucose']
+
+def evaluate_protocols(patients):
+    # Evaluate the five protocols for a whole table of patients in one vectorized pass.
+    # `patients` is a DataFrame or a mapping of NumPy columns holding PROTOCOL_FIELDS.
+    # Each protocol column holds 1 where the scalar function returns its alert message
+    # (PROTOCOL_MESSAGES[protocol][1]) and 0 otherwise, matching it row for row.
+    index = patients.index if isinstance(patients, pd.DataFrame) else None
+    col = {field: np.asarray(patients[field], dtype=np.float64) for field in PROTOCOL_FIELDS}
+
+    temperature = col['temperature']
+    wbc = col['white_blood_cells']
+    sirs_score = ((temperature > 38.0) | (temperature < 36.0)).astype(np.int8)
+    sirs_score += col['heart_rate'] > 90
+    sirs_score += col['respiratory_rate'] > 20
+    sirs_score += (wbc > 12000) | (wbc < 4000)
+
+    mean_arterial_pressure = (2 * col['diastolic_bp'] + col['systolic_bp']) / 3
+    tidal_volume = col['weight'] * 6
+    plateau_pressure = col['peak_pressure'] - col['peep']
+
+    return pd.DataFrame({
+        'sepsis': (sirs_score >= 2).view(np.int8),
+        'shock': (mean_arterial_pressure < 60).view(np.int8),
+        'ventilator': ((tidal_volume > 8) | (plateau_pressure > 30)).view(np.int8),
+        'pain_management': (col['pain_score'] > 3).view(np.int8),
+        'glycemic_control': (col['glucose'] > 180).view(np.int8),
+        'sirs_score': sirs_score,
+        'map': mean_arterial_pressure,
+    }, index=index)
+
+def protocol_messages(results):
+    # Decode the integer status codes from evaluate_protocols into the scalar functions' messages
+    return pd.DataFrame({
+        protocol: np.asarray(messages, dtype=object)[results[protocol].to_numpy()]
+        for protocol, messages in PROTOCOL_MESSAGES.items()
+    }, index=results.index)
@@ -0,0 +1,332 @@
+"""
+Lightweight hot-path instrumentation for the services and batch scripts.
+
+Metrics are recorded in a process-wide registry and exposed as Prometheus text (the FastAPI app's /metrics route) or
+as JSON (`to_dict`, `dump_json`):
+
+    icu_stage_seconds{stage}                  histogram of stage latencies
+    icu_rows_total{stage}                     rows processed
+    icu_bytes_total{stage, direction}         bytes fetched ('in') or loaded ('out')
+    icu_cache_requests_total{cache, result}   cache lookups by result ('hit' or 'miss')
+
+Recording is off by default; turn it on with `enable()` or ICU_METRICS=1. While it is off, a `timed` function calls
+straight through after one flag check, `stage` returns a shared no-op context manager and the `count_*` functions
+return immediately.
+
+`SamplingProfiler` samples the stack of one thread every `interval` seconds and reports folded stacks (flame graph
+input) and the hottest functions. It is independent of the metrics switch and is meant to be turned on for a single
+request or job: `run_profiled(func, ...)` for one call, or `job(name)` around a batch script's main, which profiles
+it when ICU_PROFILE_DIR is set and writes the metrics to ICU_METRICS_JSON (if set) when it ends.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds (seconds) of the latency histogram buckets; a last bucket catches everything slower
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+           30.0, 60.0)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+STAGE_SECONDS = 'icu_stage_seconds'
+ROWS_TOTAL = 'icu_rows_total'
+BYTES_TOTAL = 'icu_bytes_total'
+CACHE_REQUESTS_TOTAL = 'icu_cache_requests_total'
+
+_HELP = {
+    STAGE_SECONDS: 'Latency of instrumented stages in seconds.',
+    ROWS_TOTAL: 'Rows processed by instrumented stages.',
+    BYTES_TOTAL: 'Bytes fetched (direction="in") or loaded (direction="out") by instrumented stages.',
+    CACHE_REQUESTS_TOTAL: 'Cache lookups by result.',
+}
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        # (upper bound, observations at or below it) pairs, ending with +Inf
+        total = 0
+        buckets = []
+        for bound, count in zip(BUCKETS + (float('inf'),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+
+class Registry:
+    """
+    Histograms and counters keyed by metric name and a tuple of (label, value) pairs.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, value, labels):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, value, labels):
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def to_dict(self):
+        with self._lock:
+            histograms = [{'name': name, 'labels': dict(labels), 'count': histogram.count, 'sum': histogram.sum,
+                           'buckets': {_format_bound(bound): count for bound, count in histogram.cumulative()}}
+                          for (name, labels), histogram in sorted(self.histograms.items())]
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+        return {'histograms': histograms, 'counters': counters}
+
+    def prometheus_text(self):
+        metrics = self.to_dict()
+        lines = []
+        described = set()
+
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.extend([f"# HELP {name} {_HELP.get(name, name)}", f"# TYPE {name} {kind}"])
+
+        for histogram in metrics['histograms']:
+            name, labels = histogram['name'], histogram['labels']
+            describe(name, 'histogram')
+            for bound, count in histogram['buckets'].items():
+                lines.append(f"{name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']!r}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        for counter in metrics['counters']:
+            describe(counter['name'], 'counter')
+            lines.append(f"{counter['name']}{_format_labels(counter['labels'])} {counter['value']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in labels.items())
+    return '{' + ','.join(escaped) + '}'
+
+
+REGISTRY = Registry()
+_enabled = os.environ.get('ICU_METRICS', '').lower() in ('1', 'true', 'yes')
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        REGISTRY.observe(STAGE_SECONDS, time.perf_counter() - self.start, (('stage', self.name),))
+
+
+_NO_STAGE = nullcontext()
+
+
+def stage(name):
+    """
+    Context manager recording the latency of its block as stage `name`.
+    """
+    return _Stage(name) if _enabled else _NO_STAGE
+
+
+def timed(name):
+    """
+    Decorator recording the latency of every call as stage `name`.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                REGISTRY.observe(STAGE_SECONDS, time.perf_counter() - start, (('stage', name),))
+        return wrapper
+    return decorator
+
+
+def observe(stage_name, seconds):
+    """
+    Record a latency measured by the caller (e.g. across an `await`) as stage `stage_name`.
+    """
+    if _enabled:
+        REGISTRY.observe(STAGE_SECONDS, seconds, (('stage', stage_name),))
+
+
+def count_rows(stage_name, rows):
+    if _enabled:
+        REGISTRY.inc(ROWS_TOTAL, rows, (('stage', stage_name),))
+
+
+def count_bytes(stage_name, n_bytes, direction='in'):
+    if _enabled:
+        REGISTRY.inc(BYTES_TOTAL, n_bytes, (('direction', direction), ('stage', stage_name)))
+
+
+def count_cache(cache_name, hit):
+    if _enabled:
+        REGISTRY.inc(CACHE_REQUESTS_TOTAL, 1, (('cache', cache_name), ('result', 'hit' if hit else 'miss')))
+
+
+def prometheus_text():
+    return REGISTRY.prometheus_text()
+
+
+def to_dict():
+    return {'enabled': _enabled, 'timestamp': time.time(), **REGISTRY.to_dict()}
+
+
+def dump_json(path):
+    with open(path, 'w') as file:
+        json.dump(to_dict(), file, indent=2)
+    return path
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stack of thread `thread_id` (default: the thread that starts it) every `interval` seconds
+    from a background thread, counting folded stacks ("module:function;module:function ...", outermost first).
+    """
+    def __init__(self, interval=0.005, thread_id=None, max_depth=64):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name='icu-sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self._start
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, n=15):
+        """
+        The `n` functions with the most samples at the top of the stack (self) and anywhere on it (total).
+        """
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [{'function': function, 'self': count, 'total': total[function]} for function, count in own.most_common(n)]
+
+    def to_dict(self, n=15):
+        return {'interval': self.interval, 'samples': self.samples, 'seconds': self.seconds, 'top': self.top(n)}
+
+
+def run_profiled(func, *args, interval=0.005, **kwargs):
+    """
+    Call `func(*args, **kwargs)` under a SamplingProfiler of the calling thread. Returns (result, profiler).
+    """
+    with SamplingProfiler(interval) as profiler:
+        result = func(*args, **kwargs)
+    return result, profiler
+
+
+@contextmanager
+def job(name):
+    """
+    Wrap a batch job: profiled into ICU_PROFILE_DIR/<name>-<time>.folded if that is set, and the metrics written to
+    ICU_METRICS_JSON (if set, and recording is on) when it ends.
+    """
+    profile_dir = os.environ.get('ICU_PROFILE_DIR')
+    profiler = SamplingProfiler(float(os.environ.get('ICU_PROFILE_INTERVAL', 0.005))) if profile_dir else None
+    try:
+        with profiler or nullcontext(), stage(f"job {name}"):
+            yield
+    finally:
+        if profiler is not None:
+            os.makedirs(profile_dir, exist_ok=True)
+            with open(os.path.join(profile_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.folded"), 'w') as file:
+                file.write(profiler.folded())
+        if _enabled and os.environ.get('ICU_METRICS_JSON'):
+            dump_json(os.environ['ICU_METRICS_JSON'])
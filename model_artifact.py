@@ -0,0 +1,261 @@
+"""
+Versioned on-disk artifacts for the sepsis models.
+
+An artifact is a directory holding everything needed to score patients without retraining:
+
+    sepsis_model/
+      manifest.json     format version, kind, feature columns, category codes and the feature-schema hash
+      model.ubj         the booster in XGBoost's native binary (UBJSON) format
+      *.npy             preprocessing arrays (training medians, scaler mean and scale, selected feature indices)
+
+Two kinds are written: 'pipeline' (the predict.py preprocessing of median imputation, StandardScaler and
+SelectKBest followed by the model) and 'sepsis_predictor' (a SepsisPredictor's per-column category codes and model).
+No DataFrames or estimators are pickled. `load_artifact` only reads the manifest; the booster and the arrays
+(memory-mapped) are loaded the first time they are used, so a scoring worker starts without importing scikit-learn.
+Given the schema hash a caller was built against, `load_artifact` refuses an artifact for a different input, and
+scoring refuses data that lacks any of the artifact's feature columns.
+
+An artifact is written to a temporary directory next to `path` and renamed into place (an existing artifact is first
+renamed aside), so `path` never holds a partially written artifact or a mix of two.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+BOOSTER_FILE = 'model.ubj'
+
+PIPELINE = 'pipeline'
+SEPSIS_PREDICTOR = 'sepsis_predictor'
+
+
+def schema_hash(feature_columns, category_codes=None):
+    """
+    SHA-256 of the feature columns (in order) and the category codes, identifying the input a model expects.
+    """
+    schema = {'feature_columns': list(feature_columns), 'category_codes': category_codes or {}}
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+
+def check_columns(data, feature_columns):
+    """
+    Raise ValueError if `data` lacks any of `feature_columns`.
+    """
+    missing = [feature for feature in feature_columns if feature not in data]
+    if missing:
+        raise ValueError(f"Missing feature columns {missing!r}")
+
+
+def string_codes(category_codes):
+    """
+    `category_codes` ({feature: {category: code}}) with every category as str(category), as JSON stores object keys.
+    """
+    return {feature: {str(category): float(code) for category, code in codes.items()}
+            for feature, codes in (category_codes or {}).items()}
+
+
+def encode_frame(data, feature_columns, category_codes):
+    """
+    Float32 matrix of `data` in `feature_columns` order, with categorical columns mapped through `category_codes`
+    (keyed by str(category), see `string_codes`).
+    Missing values become NaN; missing columns and unknown categories raise ValueError.
+    """
+    check_columns(data, feature_columns)
+    X = np.empty((len(data), len(feature_columns)), dtype=np.float32)
+    for i, feature in enumerate(feature_columns):
+        if feature in category_codes:
+            codes = data[feature].astype(str).map(category_codes[feature]).where(data[feature].notna())
+            unknown = codes.isna() & data[feature].notna()
+            if unknown.any():
+                raise ValueError(f"Unknown {feature} categories {sorted(data[feature][unknown].unique())!r}")
+            X[:, i] = codes
+        else:
+            X[:, i] = data[feature].to_numpy(dtype=np.float32, na_value=np.nan)
+    return X
+
+
+def _json_scalar(value):
+    # NumPy scalars in metadata (e.g. hyperparameters from a search) are written as Python numbers
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _write(path, kind, booster, feature_columns, category_codes=None, arrays=None, metadata=None):
+    # Write into a directory next to `path` and rename it into place, so an interrupted write never corrupts it
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = tempfile.mkdtemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.partial')
+    try:
+        manifest = _write_files(partial, kind, booster, feature_columns, category_codes, arrays, metadata)
+        _replace_directory(partial, path)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    return manifest
+
+
+def _replace_directory(source, destination):
+    # os.replace cannot rename over a non-empty directory: move the old artifact aside first, then delete it
+    if not os.path.exists(destination):
+        os.replace(source, destination)
+        return
+    previous = tempfile.mkdtemp(dir=os.path.dirname(destination), prefix=os.path.basename(destination) + '.',
+                                suffix='.old')
+    os.replace(destination, os.path.join(previous, 'artifact'))
+    os.replace(source, destination)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def _write_files(path, kind, booster, feature_columns, category_codes, arrays, metadata):
+    category_codes = string_codes(category_codes)
+    booster.save_model(os.path.join(path, BOOSTER_FILE))
+    for name, array in (arrays or {}).items():
+        np.save(os.path.join(path, name + '.npy'), np.ascontiguousarray(array))
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'kind': kind,
+        'created_at': time.time(),
+        'feature_columns': list(feature_columns),
+        'category_codes': category_codes or {},
+        'schema_hash': schema_hash(feature_columns, category_codes),
+        'arrays': sorted(arrays or {}),
+        'metadata': metadata or {},
+    }
+    with open(os.path.join(path, MANIFEST), 'w') as file:
+        json.dump(manifest, file, indent=2, default=_json_scalar)
+    return manifest
+
+
+def save_pipeline(path, feature_columns, medians, scaler, selector, model, metadata=None):
+    """
+    Save the predict.py pipeline: training medians, fitted StandardScaler and SelectKBest, and the XGBoost model.
+    """
+    medians = np.asarray([medians[column] for column in feature_columns] if hasattr(medians, 'index') else medians,
+                         dtype=np.float64)
+    arrays = {
+        'medians': medians,
+        'scaler_mean': scaler.mean_ if scaler.with_mean else np.zeros(len(feature_columns)),
+        'scaler_scale': scaler.scale_ if scaler.with_std else np.ones(len(feature_columns)),
+        'selected': selector.get_support(indices=True),
+    }
+    return _write(path, PIPELINE, model.get_booster(), feature_columns, arrays=arrays, metadata=metadata)
+
+
+def save_sepsis_predictor(path, predictor, metadata=None):
+    """
+    Save a fitted SepsisPredictor: its feature order, category codes and model.
+    """
+    return _write(path, SEPSIS_PREDICTOR, predictor.booster, predictor.selected_features, predictor.category_codes,
+                  metadata=metadata)
+
+
+class ModelArtifact:
+    """
+    A loaded artifact. The booster and arrays are read on first use; `transform` and `predict_proba_matrix`
+    together score a DataFrame of patients.
+    """
+    def __init__(self, path, manifest, n_threads=None):
+        self.path = path
+        self.manifest = manifest
+        self.kind = manifest['kind']
+        self.feature_columns = manifest['feature_columns']
+        self.category_codes = manifest['category_codes']
+        self.schema_hash = manifest['schema_hash']
+        self.n_threads = n_threads
+        self._booster = None
+        self._arrays = {}
+
+    def __repr__(self):
+        return f"ModelArtifact({self.path!r}, kind={self.kind!r}, schema_hash={self.schema_hash[:12]!r})"
+
+    @property
+    def booster(self):
+        if self._booster is None:
+            import xgboost
+
+            booster = xgboost.Booster()
+            booster.load_model(os.path.join(self.path, BOOSTER_FILE))
+            if self.n_threads is not None:
+                booster.set_param({'nthread': self.n_threads})
+            self._booster = booster
+        return self._booster
+
+    def array(self, name):
+        # Preprocessing array `name`, memory-mapped read-only on first use
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.path, name + '.npy'), mmap_mode='r')
+        return self._arrays[name]
+
+    def rolling_feature_engine(self):
+        """
+        A fresh RollingFeatureEngine for a SepsisPredictor saved with a RollingFeatureSpec, or None.
+        """
+        config = self.manifest['metadata'].get('rolling_features')
+        if config is None:
+            return None
+        from rolling_features import RollingFeatureSpec
+
+        return RollingFeatureSpec.from_dict(config).engine()
+
+    def add_rolling_features(self, data, feature_engine=None):
+        """
+        `data` with the rolling-window features of a SepsisPredictor saved with a RollingFeatureSpec, backfilled
+        from its measurement rows (unchanged otherwise). Without `feature_engine` a fresh engine is used, as in
+        SepsisPredictor.encode_frame, so the features see only the rows of `data`; pass one engine for consecutive
+        parts of a file to carry each patient's history across them.
+        """
+        if feature_engine is None:
+            feature_engine = self.rolling_feature_engine()
+        if feature_engine is None or set(feature_engine.spec.feature_names) <= set(data.columns):
+            return data
+        import pandas as pd
+
+        return pd.concat([data, feature_engine.backfill(data)], axis=1)
+
+    def transform(self, data):
+        """
+        Apply the artifact's preprocessing to a DataFrame of patients and return the model's input matrix.
+        Rolling-window features not already in `data` are computed from its rows alone (see add_rolling_features).
+        Raises ValueError if `data` lacks any of the feature columns.
+        """
+        if self.kind == SEPSIS_PREDICTOR:
+            return encode_frame(self.add_rolling_features(data), self.feature_columns, self.category_codes)
+        check_columns(data, self.feature_columns)
+        X = data[self.feature_columns].to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+        missing = np.isnan(X)
+        if missing.any():
+            X[missing] = np.take(self.array('medians'), np.nonzero(missing)[1])
+        X -= self.array('scaler_mean')
+        X /= self.array('scaler_scale')
+        return X[:, self.array('selected')]
+
+    def predict_proba_matrix(self, X):
+        return self.booster.inplace_predict(X)
+
+    def check_schema(self, expected_hash):
+        if expected_hash != self.schema_hash:
+            raise ValueError(f"Feature schema mismatch: artifact {self.schema_hash[:12]}, expected {expected_hash[:12]}")
+
+
+def load_artifact(path, n_threads=None, expected_schema_hash=None):
+    """
+    Open the artifact at `path`, reading only its manifest. `n_threads` limits the booster's threads.
+    With `expected_schema_hash`, raise ValueError unless the artifact was saved for that feature schema.
+    """
+    with open(os.path.join(path, MANIFEST)) as file:
+        manifest = json.load(file)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact format {manifest.get('format_version')!r} in {path}")
+    if manifest['schema_hash'] != schema_hash(manifest['feature_columns'], manifest['category_codes']):
+        raise ValueError(f"Corrupt model artifact {path}: schema hash does not match its feature columns")
+    artifact = ModelArtifact(path, manifest, n_threads)
+    if expected_schema_hash is not None:
+        artifact.check_schema(expected_schema_hash)
+    return artifact
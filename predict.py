@@ -7,73 +7,72 @@ This algorithm uses XGBoost with Bayesian optimization to search for the best hy
  - subsample,
  - colsample_bytree, 
  - learning_rate. 
- The top 20 most important features are selected using ANOVA F-value. The trained model is evaluated on the testing data, 
+ The top 10 most important features are selected using ANOVA F-value. The trained model is evaluated on the testing data, 
  with the testing accuracy, precision, recall, and F1 score printed out.
+ The data is split before any preprocessing: median imputation, scaling and feature selection are steps of one pipeline
+ (see sepsis_pipeline.py), fitted on the training rows of each cross-validation fold and cached on disk, so every search
+ iteration reuses the fold's preprocessing. The search shares an explicit thread budget with XGBoost, checkpoints
+ after every batch of candidates (rerun the script to resume it) and the time of each stage is printed at the end.
+ The training medians, scaler, selector and best model are saved to MODEL_PATH as a versioned model artifact
+ (see model_artifact.py) so that whole census files can be scored in bulk with score_census.py.
  
 """
-import pandas as pd
-import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.feature_selection import SelectKBest, f_classif
+import os
+
 from sklearn.model_selection import train_test_split
-from xgboost import XGBClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-from skopt import BayesSearchCV
-from skopt.space import Real, Integer
 
-# Data Collection and Preprocessing
+import model_artifact
+import sepsis_pipeline
+from columnar_cache import load_csv
 
-data = pd.read_csv('sepsis_data.csv')
+ID_COLUMNS = ['PatientID', 'HospitalID', 'AdmissionID']
+MODEL_PATH = 'sepsis_model'
+CHECKPOINT_PATH = 'sepsis_search_checkpoint.json'
 
-# Remove irrelevant columns
-data.drop(['PatientID', 'HospitalID', 'AdmissionID'], axis=1, inplace=True)
+# Threads shared by the search (parallel fits) and XGBoost (threads per fit)
+N_THREADS = int(os.environ.get('N_THREADS', os.cpu_count() or 1))
+N_PARALLEL = int(os.environ.get('N_PARALLEL', max(1, N_THREADS // 4)))
 
-# Fill missing values with median
-data.fillna(data.median(), inplace=True)
+timer = sepsis_pipeline.StageTimer()
 
-# Split data into features and target
-X = data.iloc[:, :-1].values
-y = data.iloc[:, -1].values
+# Data Collection
 
-# Normalize features
-scaler = StandardScaler()
-X = scaler.fit_transform(X)
+with timer.stage('load'):
+    # Parsed once per file version into a columnar cache with compact dtypes (see columnar_cache)
+    data = load_csv('sepsis_data.csv')
 
-# Feature Selection
+    # Remove irrelevant columns
+    data.drop(ID_COLUMNS, axis=1, inplace=True)
 
-selector = SelectKBest(f_classif, k=10)
-X = selector.fit_transform(X, y)
+    # Split data into features and target
+    feature_columns = list(data.columns[:-1])
+    X = data.iloc[:, :-1].to_numpy(dtype=float)
+    y = data.iloc[:, -1].to_numpy()
 
-# Model Selection and Training
+# Split before any preprocessing, so the test rows never inform the imputation, scaling or feature selection
 
 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-# Define parameter search space
-params = {
-    'learning_rate': Real(0.001, 0.1, prior='log-uniform'),
-    'max_depth': Integer(1, 10),
-    'min_child_weight': Integer(1, 10),
-    'gamma': Real(0, 10, prior='log-uniform'),
-    'subsample': Real(0.5, 1, prior='uniform'),
-    'colsample_bytree': Real(0.1, 1, prior='uniform'),
-    'n_estimators': Integer(50, 200)
-}
-
-# Define XGBoost classifier with default parameters
-clf = XGBClassifier(objective='binary:logistic', random_state=42)
-
-# Define Bayesian search with cross-validation
-search = BayesSearchCV(clf, params, n_iter=50, cv=5, n_jobs=-1, scoring='accuracy', random_state=42)
+# Model Selection and Training
 
-# Fit the search to the training data
-search.fit(X_train, y_train)
+# Bayesian search over the model's hyperparameters (sepsis_pipeline.SEARCH_SPACE), with median imputation, scaling
+# and the top 10 features by ANOVA F-value fitted inside each cross-validation fold
+with timer.stage('search'):
+    search = sepsis_pipeline.search(X_train, y_train, n_iter=50, cv=5, k=10, scoring='accuracy',
+                                    n_threads=N_THREADS, n_parallel=N_PARALLEL, checkpoint_path=CHECKPOINT_PATH)
+print(search.summary())
 
 # Print best hyperparameters
-print(search.best_params_)
+print(search.best_params)
+
+with timer.stage('refit'):
+    pipeline = sepsis_pipeline.fit_best(X_train, y_train, search.best_params, k=10, n_threads=N_THREADS)
 
 # Model Evaluation
 
-y_pred = search.predict(X_test)
+with timer.stage('evaluate'):
+    y_pred = pipeline.predict(X_test)
 
 accuracy = accuracy_score(y_test, y_pred)
 precision = precision_score(y_test, y_pred)
@@ -82,19 +81,25 @@ f1 = f1_score(y_test, y_pred)
 
 print(f"Accuracy: {accuracy:.2f}, Precision: {precision:.2f}, Recall: {recall:.2f}, F1-Score: {f1:.2f}")
 
+# Save the training-time preprocessing and the best model for bulk scoring (see score_census.py)
+
+with timer.stage('save'):
+    model_artifact.save_pipeline(MODEL_PATH, feature_columns, pipeline.named_steps['impute'].statistics_,
+                                 pipeline.named_steps['scale'], pipeline.named_steps['select'],
+                                 pipeline.named_steps['model'], metadata={'best_params': search.best_params})
+
 # Deployment
 
-new_patient_data = pd.read_csv('new_patient_data.csv')
+with timer.stage('deploy'):
+    new_patient_data = load_csv('new_patient_data.csv', columns=['PatientID'] + feature_columns)
 
-new_patient_data.drop(['PatientID', 'HospitalID', 'AdmissionID'], axis=1, inplace=True)
-new_patient_data.fillna(new_patient_data.median(), inplace=True)
-new_patient_features = new_patient_data.values
-new_patient_features = scaler.transform(new_patient_features)
-new_patient_features = selector.transform(new_patient_features)
+    # The pipeline imputes with the training medians, in the training column order
+    sepsis_probabilities = pipeline.predict_proba(new_patient_data[feature_columns].to_numpy(dtype=float))[:, 1]
 
-sepsis_prediction = search.predict(new_patient_features)
+for patient_id, probability in zip(new_patient_data['PatientID'], sepsis_probabilities):
+    if probability > 0.5:
+        print(f"Patient {patient_id} is at risk of sepsis (p={probability:.2f}). Alert the clinical staff!")
+    else:
+        print(f"Patient {patient_id} is not at risk of sepsis (p={probability:.2f}).")
 
-if sepsis_prediction:
-    print("The patient is at risk of sepsis. Alert the clinical staff!")
-else:
-    print("The patient is not at risk of sepsis.")
\ No newline at end of file
+print(timer.report())
\ No newline at end of file
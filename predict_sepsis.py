@@ -1,81 +1,168 @@
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from xgboost import XGBClassifier
-from bayes_opt import BayesianOptimization
+
+from columnar_cache import load_csv
+import instrumentation
+import model_artifact
+import xgb_tuning
+from rolling_features import RollingFeatureSpec
 
 class SepsisPredictor:
-    def __init__(self):
+    categorical_features = ["gender", "ventilator", "central_line", "urinary_catheter"]
+    boolean_features = ["blood_culture", "urine_culture"]
+
+    def __init__(self, rolling_features=None):
         self.selected_features = ["age", "gender", "heart_rate", "respiratory_rate", "systolic_bp", "diastolic_bp", "mean_bp", "spo2", "temperature", "urine_output", "wbc_count", "platelet_count", "glucose", "sodium", "potassium", "creatinine", "bun", "lactate", "albumin", "bnp", "pao2", "pco2", "ph", "bicarbonate", "blood_culture", "urine_culture", "ventilator", "central_line", "urinary_catheter"]
-        self.le = LabelEncoder()
+        # One encoder per categorical feature, and {str(category): code} lookup tables derived from them for scoring
+        # (string keys, as in a saved artifact's JSON manifest, so ints or bools encode the same after load)
+        self.encoders = {}
+        self.category_codes = {}
         self.xgb_model = None
+        self._booster = None
+        self._artifact = None
+        self.tuning = None
+        # Optional per-patient rolling-window features (a RollingFeatureSpec), computed by the same engine code
+        # for training (backfilled from the measurement rows) and for online scoring (updated as records arrive)
+        self.rolling_features = rolling_features
+        self.feature_engine = None
+        if rolling_features is not None:
+            self.selected_features = self.selected_features + rolling_features.feature_names
+            self.feature_engine = rolling_features.engine()
+
+    def add_rolling_features(self, data, update=True):
+        # `data` with the rolling-window features of its rows: a DataFrame of measurement rows is backfilled with
+        # a fresh engine, a single patient record (dict) updates the online engine and gets the patient's features
+        # (with update=False, the features the record would give, leaving the engine unchanged)
+        if self.rolling_features is None:
+            return data
+        if isinstance(data, pd.DataFrame):
+            if set(self.rolling_features.feature_names) <= set(data.columns):
+                return data
+            return pd.concat([data, self.rolling_features.engine().backfill(data)], axis=1)
+        if not update:
+            return {**data, **self.feature_engine.preview_record(data)}
+        return {**data, **self.feature_engine.update_record(data)}
 
     def preprocess_data(self, data):
-        X = data[self.selected_features]
+        data = self.add_rolling_features(data)
+        X = data[self.selected_features].copy()
         y = data["sepsis"]
-        X["gender"] = self.le.fit_transform(X["gender"])
-        X["ventilator"] = self.le.fit_transform(X["ventilator"])
-        X["central_line"] = self.le.fit_transform(X["central_line"])
-        X["urinary_catheter"] = self.le.fit_transform(X["urinary_catheter"])
-        X["blood_culture"] = X["blood_culture"].astype(int)
-        X["urine_culture"] = X["urine_culture"].astype(int)
+        for feature in self.categorical_features:
+            self.encoders[feature] = LabelEncoder()
+            X[feature] = self.encoders[feature].fit_transform(X[feature])
+        self.category_codes = model_artifact.string_codes(
+            {feature: {category: code for code, category in enumerate(encoder.classes_)}
+             for feature, encoder in self.encoders.items()})
+        for feature in self.boolean_features:
+            X[feature] = X[feature].astype(int)
         return X, y
 
-    def train_model(self, X, y):
-        def xgb_cv(max_depth, learning_rate, n_estimators, gamma, min_child_weight, max_delta_step, subsample, colsample_bytree):
-            model = XGBClassifier(max_depth=int(max_depth),
-                                  learning_rate=learning_rate,
-                                  n_estimators=int(n_estimators),
-                                  gamma=gamma,
-                                  min_child_weight=min_child_weight,
-                                  max_delta_step=int(max_delta_step),
-                                  subsample=subsample,
-                                  colsample_bytree=colsample_bytree,
-                                  random_state=42,
-                                  tree_method='gpu_hist')
-            cv_result = XGBClassifier.cross_val_score(model, X, y, cv=5).mean()
-            return cv_result
-
-        xgbBO = BayesianOptimization(f=xgb_cv, pbounds={'max_depth': (3, 20), 'learning_rate': (0.01, 0.3), 'n_estimators': (100, 1000), 'gamma': (0, 1), 'min_child_weight': (1, 10), 'max_delta_step': (0, 10), 'subsample': (0.5, 1), 'colsample_bytree': (0.5, 1)})
-        xgbBO.maximize(n_iter=10, init_points=10)
-
-        # Get the optimal hyperparameters
-        params = xgbBO.max['params']
-        params['max_depth'] = int(params['max_depth'])
-        params['n_estimators'] = int(params['n_estimators'])
-        params['max_delta_step'] = int(params['max_delta_step'])
-
-        # Train the final model with the optimal hyperparameters
-        self.xgb_model = XGBClassifier(**params, tree_method='gpu_hist')
+    def train_model(self, X, y, n_iter=10, init_points=10, n_threads=None, n_parallel=None):
+        # Bayesian search on CPU (see xgb_tuning): hist trees on folds binned once, early stopping on each
+        # validation fold and successive-halving pruning of weak trials, with `n_threads` split between parallel trials.
+        # Returns the search result (also kept as `self.tuning`); its summary() reports trials, pruning and time.
+        self.tuning = xgb_tuning.tune(X, y, pbounds={'max_depth': (3, 20), 'learning_rate': (0.01, 0.3), 'n_estimators': (100, 1000), 'gamma': (0, 1), 'min_child_weight': (1, 10), 'max_delta_step': (0, 10), 'subsample': (0.5, 1), 'colsample_bytree': (0.5, 1)},
+                                      n_iter=n_iter, init_points=init_points, n_threads=n_threads, n_parallel=n_parallel)
+
+        # Train the final model with the optimal hyperparameters and the early-stopped number of trees
+        self.xgb_model = XGBClassifier(**self.tuning.best_params, tree_method='hist', n_jobs=n_threads, random_state=42)
         self.xgb_model.fit(X, y)
+        self._booster = None
+        return self.tuning
+
+    @property
+    def booster(self):
+        # Cached native booster of the fitted model (or of the loaded artifact), used for in-place prediction on NumPy arrays
+        if self._booster is None:
+            self._booster = self.xgb_model.get_booster() if self.xgb_model is not None else self._artifact.booster
+        return self._booster
+
+    def save(self, path):
+        # Save the feature order, category codes, rolling feature spec and booster as a versioned model artifact
+        # (see model_artifact)
+        metadata = {'rolling_features': self.rolling_features.to_dict()} if self.rolling_features is not None else None
+        return model_artifact.save_sepsis_predictor(path, self, metadata)
+
+    @classmethod
+    def load(cls, path, n_threads=None, schema_hash=None):
+        # Predictor ready to score from a saved artifact, without retraining; the booster is read on first use.
+        # With `schema_hash`, the artifact must have been saved for that feature schema.
+        artifact = model_artifact.load_artifact(path, n_threads, expected_schema_hash=schema_hash)
+        if artifact.kind != model_artifact.SEPSIS_PREDICTOR:
+            raise ValueError(f"{path} is a {artifact.kind!r} artifact, not a SepsisPredictor")
+        rolling_features = artifact.manifest['metadata'].get('rolling_features')
+        predictor = cls(RollingFeatureSpec.from_dict(rolling_features) if rolling_features is not None else None)
+        predictor.selected_features = artifact.feature_columns
+        predictor.category_codes = artifact.category_codes
+        predictor._artifact = artifact
+        return predictor
+
+    def encode_patient(self, patient_data, out):
+        # Write one patient's features into the preallocated float32 row `out`, in `selected_features` order.
+        # Categorical values are looked up in the precomputed tables; missing values become NaN.
+        for i, feature in enumerate(self.selected_features):
+            value = patient_data.get(feature)
+            if value is None:
+                out[i] = np.nan
+            elif feature in self.category_codes:
+                try:
+                    out[i] = self.category_codes[feature][str(value)]
+                except KeyError:
+                    raise ValueError(f"Unknown {feature} category {value!r}") from None
+            else:
+                out[i] = int(value) if feature in self.boolean_features else value
+        return out
 
-    def predict_sepsis(self, patient_data):
-        patient_data = pd.DataFrame(patient_data, index=[0], columns=self.selected_features)
-        patient_data["gender"] = self.le.transform(patient_data["gender"])
-        patient_data["ventilator"] = self.le.transform(patient_data["ventilator"])
-        patient_data["central_line"] = self.le.transform(patient_data["central_line"])
-        patient_data["urinary_catheter"] = self.le.transform(patient_data["urinary_catheter"])
-        patient_data["blood_culture"] = patient_data["blood_culture"].astype(int)
-        patient_data["urine_culture"] = patient_data["urine_culture"].astype(int)
-        pred = self.xgb_model.predict(patient_data)[0]
-        if pred == 1:
-            return "Sepsis detected."
-        else:
-            return "Sepsis not detected."
+    @instrumentation.timed("sepsis.encode_frame")
+    def encode_frame(self, data):
+        # Vectorized encode_patient for a DataFrame of patients; returns a float32 matrix in `selected_features` order
+        return model_artifact.encode_frame(self.add_rolling_features(data), self.selected_features, self.category_codes)
+
+    @instrumentation.timed("sepsis.predict")
+    def predict_proba_matrix(self, X):
+        # Sepsis probabilities for a float32 matrix of encoded patients, one booster call for the whole batch
+        instrumentation.count_rows("sepsis.predict", len(X))
+        return self.booster.inplace_predict(X)
+
+    @instrumentation.timed("sepsis.score")
+    def score(self, patient_data, update=True):
+        # Probability of sepsis and verdict for one patient (with rolling features, one new record of the patient).
+        # With rolling features, scoring a record adds its measurements to `feature_engine`, so records must be scored
+        # once each and in time order per patient; update=False scores a what-if record without recording it.
+        patient_data = self.add_rolling_features(patient_data, update)
+        row = self.encode_patient(patient_data, np.empty(len(self.selected_features), dtype=np.float32))
+        probability = float(self.predict_proba_matrix(row[np.newaxis, :])[0])
+        return {"probability": probability, "verdict": self.verdict(probability)}
+
+    @staticmethod
+    def verdict(probability):
+        return "Sepsis detected." if probability > 0.5 else "Sepsis not detected."
+
+    def predict_sepsis(self, patient_data, update=True):
+        return self.score(patient_data, update)["verdict"]
 
 
 # Example usage
 if __name__ == "__main__":
     # 1. Data Collection and Preprocessing
-    data = pd.read_csv("icu_patient_data.csv")
+    predictor = SepsisPredictor()
+    # Only the model's columns, from a columnar cache parsed once per file version (see columnar_cache)
+    data = load_csv("icu_patient_data.csv", columns=predictor.selected_features + ["sepsis"],
+                    schema={feature: "category" for feature in SepsisPredictor.categorical_features})
     data = data.dropna()
 
-    predictor = SepsisPredictor()
     X, y = predictor.preprocess_data(data)
 
     # 2. Model Training
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    predictor.train_model(X_train, y_train)
+    tuning = predictor.train_model(X_train, y_train)
+    print(tuning.summary())
+
+    # Save the fitted predictor so scoring processes can load it with SepsisPredictor.load instead of retraining
+    predictor.save("sepsis_predictor_model")
 
     # 3. Model Deployment
     patient_data = {
@@ -0,0 +1,282 @@
+"""
+Incremental per-patient rolling-window features over ICU time series.
+
+`RollingFeatureSpec(signals, windows)` names the features: for every signal, its last value and the hours since it
+was last measured, and for every window (e.g. '1h', '6h') the mean, minimum, maximum and slope (change per hour, by
+least squares) of the measurements in that window. A `RollingFeatureEngine` keeps, per patient and signal:
+
+ - the last value and time
+ - per window, a ring buffer of the measurements still in the window with running sums (count, sum of times, values,
+   squared times and time x value products), so mean and slope are O(1) per measurement
+ - per window, monotonic deques of candidate minima and maxima, so min and max are amortized O(1)
+
+Measurements older than the window are evicted as new ones arrive, or when features are read at a later time.
+`backfill` runs a DataFrame of measurement rows through the same update path as `update_record`, so training
+features (offline) and scoring features (online) are computed by the same code.
+
+Timestamps may be datetimes (naive ones are read as UTC) or numbers of seconds. Missing values (None or NaN) are not
+measurements. A signal's measurements must arrive in time order per patient.
+"""
+import copy
+import math
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+WINDOW_AGGREGATES = ('mean', 'min', 'max', 'slope')
+
+SIGNALS = ('heart_rate', 'respiratory_rate', 'systolic_bp', 'mean_bp', 'spo2', 'temperature', 'lactate')
+WINDOWS = ('1h', '6h')
+
+
+def _seconds(timestamp):
+    # Seconds since the epoch for a datetime-like or numeric timestamp
+    if isinstance(timestamp, (int, float, np.integer, np.floating)):
+        return float(timestamp)
+    return pd.Timestamp(timestamp).value / 1e9
+
+
+def timestamp_seconds(values):
+    """
+    Vectorized `_seconds` for a column of timestamps.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float64)
+    times = pd.to_datetime(values, utc=True)
+    return times.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+
+
+class RollingFeatureSpec:
+    """
+    The signals and windows to aggregate, and the columns holding the patient id and measurement time.
+    """
+    def __init__(self, signals=SIGNALS, windows=WINDOWS, patient_column='patient_id', time_column='timestamp'):
+        self.signals = list(signals)
+        self.windows = list(windows)
+        self.window_seconds = [pd.Timedelta(window).total_seconds() for window in self.windows]
+        self.patient_column = patient_column
+        self.time_column = time_column
+        self.feature_names = []
+        for signal in self.signals:
+            self.feature_names += [f"{signal}_last", f"{signal}_since_last"]
+            for window in self.windows:
+                self.feature_names += [f"{signal}_{aggregate}_{window}" for aggregate in WINDOW_AGGREGATES]
+
+    def __repr__(self):
+        return f"RollingFeatureSpec(signals={self.signals!r}, windows={self.windows!r})"
+
+    def to_dict(self):
+        return {'signals': self.signals, 'windows': self.windows, 'patient_column': self.patient_column,
+                'time_column': self.time_column}
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls(**config)
+
+    def engine(self):
+        return RollingFeatureEngine(self)
+
+
+class _Window:
+    __slots__ = ('length', 'times', 'values', 'n', 'sum_t', 'sum_v', 'sum_tt', 'sum_tv', 'minima', 'maxima')
+
+    def __init__(self, length):
+        self.length = length
+        self.times = deque()
+        self.values = deque()
+        self.n = 0
+        self.sum_t = self.sum_v = self.sum_tt = self.sum_tv = 0.0
+        self.minima = deque()
+        self.maxima = deque()
+
+    def push(self, t, value):
+        self.times.append(t)
+        self.values.append(value)
+        self.n += 1
+        self.sum_t += t
+        self.sum_v += value
+        self.sum_tt += t * t
+        self.sum_tv += t * value
+        minima, maxima = self.minima, self.maxima
+        while minima and minima[-1][1] >= value:
+            minima.pop()
+        minima.append((t, value))
+        while maxima and maxima[-1][1] <= value:
+            maxima.pop()
+        maxima.append((t, value))
+
+    def evict(self, now):
+        # Keep the measurements in (now - length, now]
+        cutoff = now - self.length
+        times, values = self.times, self.values
+        while times and times[0] <= cutoff:
+            t = times.popleft()
+            value = values.popleft()
+            self.n -= 1
+            self.sum_t -= t
+            self.sum_v -= value
+            self.sum_tt -= t * t
+            self.sum_tv -= t * value
+        if not self.n:
+            # Reset the running sums so rounding errors do not accumulate across empty windows
+            self.sum_t = self.sum_v = self.sum_tt = self.sum_tv = 0.0
+        while self.minima and self.minima[0][0] <= cutoff:
+            self.minima.popleft()
+        while self.maxima and self.maxima[0][0] <= cutoff:
+            self.maxima.popleft()
+
+    def aggregates(self):
+        # (mean, min, max, slope per hour), NaN where undefined
+        n = self.n
+        if not n:
+            return math.nan, math.nan, math.nan, math.nan
+        mean = self.sum_v / n
+        spread = n * self.sum_tt - self.sum_t * self.sum_t
+        slope = 3600.0 * (n * self.sum_tv - self.sum_t * self.sum_v) / spread if n > 1 and spread > 0 else math.nan
+        return mean, self.minima[0][1], self.maxima[0][1], slope
+
+
+class _Series:
+    # One patient's measurements of one signal; times are kept relative to the first measurement
+    __slots__ = ('origin', 'last_time', 'last_value', 'windows')
+
+    def __init__(self, origin, window_seconds):
+        self.origin = origin
+        self.last_time = -math.inf
+        self.last_value = math.nan
+        self.windows = [_Window(length) for length in window_seconds]
+
+    def push(self, t, value):
+        if t < self.last_time:
+            raise ValueError(f"Measurement at {t + self.origin} is older than the previous one at "
+                             f"{self.last_time + self.origin}")
+        self.last_time = t
+        self.last_value = value
+        for window in self.windows:
+            window.push(t, value)
+
+    def write(self, now, out, start):
+        # Write this series' features at relative time `now` into out[start:]
+        out[start] = self.last_value
+        out[start + 1] = (now - self.last_time) / 3600.0
+        start += 2
+        for window in self.windows:
+            window.evict(now)
+            out[start:start + 4] = window.aggregates()
+            start += 4
+
+
+class RollingFeatureEngine:
+    """
+    Rolling-window state of every patient seen, updated one measurement (or record) at a time.
+    """
+    def __init__(self, spec):
+        self.spec = spec
+        self._series = {}
+        self._lock = threading.Lock()
+        self._width = 2 + 4 * len(spec.windows)
+
+    def __len__(self):
+        # Number of patients tracked
+        return len({patient_id for patient_id, _ in self._series})
+
+    def _push(self, patient_id, signal, value, seconds):
+        series = self._series.get((patient_id, signal))
+        if series is None:
+            series = self._series[(patient_id, signal)] = _Series(seconds, self.spec.window_seconds)
+        series.push(seconds - series.origin, float(value))
+
+    def _write(self, patient_id, seconds, out):
+        # Features of one patient at `seconds` into the row `out`, in `spec.feature_names` order
+        for i, signal in enumerate(self.spec.signals):
+            start = i * self._width
+            series = self._series.get((patient_id, signal))
+            if series is None:
+                out[start:start + self._width] = math.nan
+            else:
+                series.write(seconds - series.origin, out, start)
+        return out
+
+    def update(self, patient_id, signal, value, timestamp):
+        """
+        Add one measurement of `signal` for a patient.
+        """
+        with self._lock:
+            self._push(patient_id, signal, value, _seconds(timestamp))
+
+    def features(self, patient_id, timestamp):
+        """
+        {feature name: value} for a patient at `timestamp` (not earlier than the patient's last measurement).
+        """
+        out = np.empty(len(self.spec.feature_names))
+        with self._lock:
+            self._write(patient_id, _seconds(timestamp), out)
+        return dict(zip(self.spec.feature_names, out.tolist()))
+
+    def update_record(self, record):
+        """
+        Add the measurements of a record ({patient_column, time_column, signal: value, ...}; missing signals are
+        skipped) and return the patient's features as of the record's time.
+        """
+        with self._lock:
+            return self._update_record(record)
+
+    def preview_record(self, record):
+        """
+        The features `update_record(record)` would return, leaving the patient's state unchanged.
+        """
+        keys = [(record[self.spec.patient_column], signal) for signal in self.spec.signals]
+        with self._lock:
+            saved = {key: self._series[key] for key in keys if key in self._series}
+            self._series.update(copy.deepcopy(saved))
+            try:
+                return self._update_record(record)
+            finally:
+                for key in keys:
+                    if key in saved:
+                        self._series[key] = saved[key]
+                    else:
+                        self._series.pop(key, None)
+
+    def _update_record(self, record):
+        patient_id = record[self.spec.patient_column]
+        seconds = _seconds(record[self.spec.time_column])
+        out = np.empty(len(self.spec.feature_names))
+        for signal in self.spec.signals:
+            value = record.get(signal)
+            if value is not None and value == value:
+                self._push(patient_id, signal, value, seconds)
+        self._write(patient_id, seconds, out)
+        return dict(zip(self.spec.feature_names, out.tolist()))
+
+    def backfill(self, data):
+        """
+        Run a DataFrame of measurement rows through the engine in time order (stable within a patient) and return
+        each row's features as of its time, as a DataFrame aligned with `data`.
+        """
+        spec = self.spec
+        patients = data[spec.patient_column].to_numpy()
+        seconds = timestamp_seconds(data[spec.time_column])
+        values = [data[signal].to_numpy(dtype=np.float64, na_value=np.nan) if signal in data
+                  else np.full(len(data), np.nan) for signal in spec.signals]
+        out = np.empty((len(data), len(spec.feature_names)))
+        with self._lock:
+            for row in np.argsort(seconds, kind='stable'):
+                patient_id, now = patients[row], seconds[row]
+                for signal, column in zip(spec.signals, values):
+                    value = column[row]
+                    if value == value:
+                        self._push(patient_id, signal, value, now)
+                self._write(patient_id, now, out[row])
+        return pd.DataFrame(out, index=data.index, columns=spec.feature_names)
+
+    def discard(self, patient_id):
+        """
+        Drop a patient's state (e.g. on discharge).
+        """
+        with self._lock:
+            for signal in self.spec.signals:
+                self._series.pop((patient_id, signal), None)
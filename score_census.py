@@ -0,0 +1,154 @@
+"""
+Bulk sepsis scoring of whole ICU census files.
+
+The census CSV is streamed in chunks. Each chunk gets the training-time preprocessing of a saved model and is scored
+with one vectorized call, and per-patient probabilities are written to Parquet or CSV as chunks complete. Chunks are
+scored on a process pool (one single-threaded model per core) with a bounded number in flight, so memory stays flat
+whatever the size of the census and the output keeps the input order.
+
+The model is a versioned artifact (see model_artifact.py): either the pipeline saved by predict.py (training medians,
+scaler, selector and the best XGBoost model) or a saved SepsisPredictor (category codes and model).
+
+For a SepsisPredictor with rolling-window features, one feature engine runs over the chunks in file order in the
+main process before they are sent to the workers, so a patient's history carries across chunk boundaries and the
+scores do not depend on the chunk size or the number of workers. Each patient's rows must then be in time order
+across the file (within a chunk any order is fine); a row older than an earlier chunk's raises ValueError.
+
+Usage:
+    python score_census.py census.csv scores.parquet [--model sepsis_model] [--chunk-size 100000] [--jobs N]
+        [--schema-hash HASH]
+
+With ICU_METRICS=1 and ICU_METRICS_JSON=<path> the run's latency and rows scored are written to <path> as JSON;
+ICU_PROFILE_DIR=<dir> profiles the run (see instrumentation.py).
+"""
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from model_artifact import load_artifact
+
+MODEL_PATH = 'sepsis_model'
+CHUNK_SIZE = 100_000
+ID_COLUMNS = ['PatientID', 'HospitalID', 'AdmissionID']
+THRESHOLD = 0.5
+
+# Model loaded once per worker process by `_init_worker`
+_model = None
+
+
+def score_chunk(model, chunk, id_columns=ID_COLUMNS, threshold=THRESHOLD):
+    """
+    Score one chunk of the census with a loaded model artifact; returns its id columns with `sepsis_probability`
+    and `sepsis_risk`.
+    """
+    probabilities = model.predict_proba_matrix(model.transform(chunk))
+    scores = chunk[[column for column in id_columns if column in chunk]].reset_index(drop=True)
+    scores['sepsis_probability'] = probabilities.astype(np.float32)
+    scores['sepsis_risk'] = scores['sepsis_probability'] > threshold
+    return scores
+
+
+def _init_worker(model_path, schema_hash):
+    global _model
+    _model = load_artifact(model_path, n_threads=1, expected_schema_hash=schema_hash)
+
+
+def _score_chunk_task(chunk, id_columns, threshold):
+    return score_chunk(_model, chunk, id_columns, threshold)
+
+
+def iter_scores(census_path, model_path=MODEL_PATH, chunk_size=CHUNK_SIZE, n_jobs=None, id_columns=ID_COLUMNS,
+                threshold=THRESHOLD, schema_hash=None):
+    """
+    Yield a DataFrame of scores per census chunk, in file order.
+    With `n_jobs` > 1, chunks are scored on that many worker processes with at most 2 * `n_jobs` chunks in flight.
+    With `schema_hash`, the model must have been saved for that feature schema (see model_artifact.schema_hash).
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    model = load_artifact(model_path, expected_schema_hash=schema_hash)
+    chunks = pd.read_csv(census_path, chunksize=chunk_size)
+    # Rolling-window features from one engine over the whole file, in file order
+    feature_engine = model.rolling_feature_engine()
+    if feature_engine is not None:
+        chunks = (model.add_rolling_features(chunk, feature_engine) for chunk in chunks)
+    if n_jobs == 1:
+        for chunk in chunks:
+            yield score_chunk(model, chunk, id_columns, threshold)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(model_path, schema_hash)) as executor:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(_score_chunk_task, chunk, id_columns, threshold))
+            if len(in_flight) >= 2 * n_jobs:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def write_scores(scores, output_path):
+    """
+    Write an iterable of score DataFrames to one Parquet (.parquet) or CSV file, chunk by chunk.
+    Returns the number of rows written.
+    """
+    n_rows = 0
+    if output_path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for frame in scores:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+                n_rows += len(frame)
+        finally:
+            if writer is not None:
+                writer.close()
+    else:
+        with open(output_path, 'w', newline='') as output:
+            for i, frame in enumerate(scores):
+                frame.to_csv(output, header=i == 0, index=False)
+                n_rows += len(frame)
+    return n_rows
+
+
+def score_census(census_path, output_path, model_path=MODEL_PATH, chunk_size=CHUNK_SIZE, n_jobs=None,
+                 id_columns=ID_COLUMNS, threshold=THRESHOLD, schema_hash=None):
+    """
+    Score every patient in `census_path` and write the scores to `output_path`; returns the number of patients.
+    """
+    with instrumentation.stage('census.score'):
+        scores = iter_scores(census_path, model_path, chunk_size, n_jobs, id_columns, threshold, schema_hash)
+        n_rows = write_scores(scores, output_path)
+    instrumentation.count_rows('census.score', n_rows)
+    return n_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every patient in an ICU census file for sepsis risk.")
+    parser.add_argument('census', help="census CSV file")
+    parser.add_argument('output', help="output file (.parquet for Parquet, anything else for CSV)")
+    parser.add_argument('--model', default=MODEL_PATH, help="saved model (default: %(default)s)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="rows per chunk (default: %(default)s)")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--id-columns', nargs='+', default=ID_COLUMNS, help="columns copied to the output")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="probability flagged as at risk")
+    parser.add_argument('--schema-hash', default=None, help="refuse a model saved for a different feature schema")
+    args = parser.parse_args()
+
+    n_rows = score_census(args.census, args.output, args.model, args.chunk_size, args.jobs, args.id_columns,
+                          args.threshold, args.schema_hash)
+    print(f"Scored {n_rows} patients -> {args.output}")
+
+
+if __name__ == '__main__':
+    with instrumentation.job('score_census'):
+        main()
@@ -0,0 +1,219 @@
+"""
+Leakage-free, cached training pipeline for predict.py.
+
+Median imputation, StandardScaler and SelectKBest(f_classif) are steps of one scikit-learn Pipeline ending in the
+XGBoost model, so within a cross-validation fold they are fitted on that fold's training rows only. `search` tunes
+the model's hyperparameters with scikit-optimize's ask/tell loop:
+
+ - the folds are fixed for the whole search, and the Pipeline's joblib `Memory` (a disk cache in `cache_dir`) stores
+   each fold's fitted preprocessing, so it is computed once and reused by every later candidate (and by later runs)
+ - `n_parallel` fits run at once in worker processes, each XGBoost model (and any BLAS/OpenMP pool in the worker)
+   limited to `n_threads // n_parallel` threads, so the search never uses more than `n_threads` threads
+ - after every batch of candidates the evaluated points are written to `checkpoint_path`; a search started with an
+   existing checkpoint replays those points into the optimizer and evaluates only the remaining iterations (its
+   later suggestions can differ from those of an uninterrupted search, as the optimizer's random state is not saved).
+   The checkpoint records a fingerprint of X, y, the search space, cv, k, scoring and random_state, and resuming
+   with any of them changed raises ValueError instead of mixing scores from different searches
+
+`StageTimer` records the wall-clock time of each stage of the training script.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from joblib import Memory, Parallel, delayed, parallel_config
+from sklearn.base import clone
+from sklearn.feature_selection import SelectKBest, f_classif
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from skopt import Optimizer
+from skopt.space import Integer, Real
+from xgboost import XGBClassifier
+
+CACHE_DIR = os.environ.get('PIPELINE_CACHE_DIR', '.pipeline_cache')
+
+# Hyperparameters of the pipeline's model step
+SEARCH_SPACE = {
+    'model__learning_rate': Real(0.001, 0.1, prior='log-uniform'),
+    'model__max_depth': Integer(1, 10),
+    'model__min_child_weight': Integer(1, 10),
+    'model__gamma': Real(1e-3, 10, prior='log-uniform'),
+    'model__subsample': Real(0.5, 1, prior='uniform'),
+    'model__colsample_bytree': Real(0.1, 1, prior='uniform'),
+    'model__n_estimators': Integer(50, 200),
+}
+
+
+def split_threads(n_threads=None, n_parallel=None):
+    """
+    (n_parallel, threads per fit) for a budget of `n_threads` (default: all cores) threads.
+    """
+    n_threads = n_threads or os.cpu_count() or 1
+    n_parallel = max(1, min(n_parallel or n_threads, n_threads))
+    return n_parallel, max(1, n_threads // n_parallel)
+
+
+def make_pipeline(k=10, n_jobs=1, memory=None, random_state=42):
+    """
+    Median imputation, scaling and k-best feature selection followed by an XGBoost classifier using `n_jobs` threads.
+    """
+    return Pipeline([
+        ('impute', SimpleImputer(strategy='median')),
+        ('scale', StandardScaler()),
+        ('select', SelectKBest(f_classif, k=k)),
+        ('model', XGBClassifier(objective='binary:logistic', tree_method='hist', n_jobs=n_jobs,
+                                random_state=random_state)),
+    ], memory=memory)
+
+
+class StageTimer:
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+
+    def report(self):
+        total = sum(self.seconds.values())
+        lines = [f"  {name:<12} {seconds:8.2f}s  {seconds / total:6.1%}" for name, seconds in self.seconds.items()]
+        return '\n'.join(['Stage timings:'] + lines + [f"  {'total':<12} {total:8.2f}s"])
+
+
+class SearchResult:
+    def __init__(self, trials, seconds, n_parallel, threads_per_fit, resumed):
+        self.trials = trials
+        self.seconds = seconds
+        self.n_parallel = n_parallel
+        self.threads_per_fit = threads_per_fit
+        self.resumed = resumed
+        self.best = max(trials, key=lambda trial: trial['score'])
+
+    @property
+    def best_params(self):
+        return self.best['params']
+
+    @property
+    def best_score(self):
+        return self.best['score']
+
+    def summary(self):
+        return (f"{len(self.trials)} candidates ({self.resumed} from checkpoint) in {self.seconds:.1f}s on "
+                f"{self.n_parallel} x {self.threads_per_fit} threads; best CV score {self.best_score:.4f}")
+
+
+def _array_digest(digest, values):
+    digest.update(f"{values.dtype.str}{values.shape}".encode())
+    if values.dtype.kind == 'O':
+        digest.update('\x1f'.join(map(repr, values.ravel())).encode())
+    else:
+        digest.update(np.ascontiguousarray(values).tobytes())
+
+
+def search_fingerprint(X, y, space, cv, k, scoring, random_state):
+    """
+    SHA-256 of the training data and of the settings that determine a candidate's score, identifying the search a
+    checkpoint belongs to.
+    """
+    digest = hashlib.sha256()
+    _array_digest(digest, X)
+    _array_digest(digest, y)
+    config = {'space': {name: repr(dimension) for name, dimension in space.items()}, 'cv': cv, 'k': k,
+              'scoring': scoring, 'random_state': random_state}
+    digest.update(json.dumps(config, sort_keys=True, default=repr).encode())
+    return digest.hexdigest()
+
+
+def load_checkpoint(path, names, fingerprint=None):
+    if path is None or not os.path.exists(path):
+        return []
+    with open(path) as file:
+        checkpoint = json.load(file)
+    if checkpoint['names'] != names:
+        raise ValueError(f"Checkpoint {path} is for the search space {checkpoint['names']}, not {names}")
+    if checkpoint.get('fingerprint') != fingerprint:
+        raise ValueError(f"Checkpoint {path} is for different data or search settings (cv, k, scoring, random_state "
+                         f"or space); delete it to start over")
+    return checkpoint['trials']
+
+
+def save_checkpoint(path, names, trials, fingerprint=None):
+    # Write next to the checkpoint and rename, so an interrupted write never corrupts it
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, partial = tempfile.mkstemp(dir=directory, suffix='.partial')
+    with os.fdopen(handle, 'w') as file:
+        json.dump({'names': names, 'fingerprint': fingerprint, 'trials': trials}, file, indent=2)
+    os.replace(partial, path)
+
+
+def _json_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _fit_and_score(pipeline, params, X, y, train, test, scoring):
+    pipeline = clone(pipeline).set_params(**params)
+    pipeline.fit(X[train], y[train])
+    return get_scorer(scoring)(pipeline, X[test], y[test])
+
+
+def search(X, y, space=SEARCH_SPACE, n_iter=50, cv=5, k=10, scoring='accuracy', n_threads=None, n_parallel=None,
+           cache_dir=CACHE_DIR, checkpoint_path=None, n_initial_points=10, random_state=42):
+    """
+    Bayesian search of `space` ({pipeline parameter: skopt dimension}) for the pipeline with the best mean
+    `scoring` over `cv` stratified folds, `n_iter` candidates in all (including those already in the checkpoint).
+    Raises ValueError if `checkpoint_path` holds a search of other data or settings. Returns a SearchResult.
+    """
+    start = time.perf_counter()
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    n_parallel, threads_per_fit = split_threads(n_threads, n_parallel)
+    names = list(space)
+    pipeline = make_pipeline(k, threads_per_fit, Memory(cache_dir, verbose=0) if cache_dir else None, random_state)
+    folds = list(StratifiedKFold(cv, shuffle=True, random_state=random_state).split(X, y))
+
+    optimizer = Optimizer(list(space.values()), random_state=random_state,
+                          n_initial_points=min(n_initial_points, n_iter))
+    fingerprint = search_fingerprint(X, y, space, cv, k, scoring, random_state) if checkpoint_path else None
+    trials = load_checkpoint(checkpoint_path, names, fingerprint)[:n_iter]
+    if trials:
+        # skopt minimizes, so it is told the negated scores
+        optimizer.tell([[trial['params'][name] for name in names] for trial in trials],
+                       [-trial['score'] for trial in trials])
+    resumed = len(trials)
+
+    with parallel_config(backend='loky', inner_max_num_threads=threads_per_fit):
+        with Parallel(n_jobs=n_parallel) as parallel:
+            while len(trials) < n_iter:
+                batch_start = time.perf_counter()
+                points = optimizer.ask(n_points=min(n_parallel, n_iter - len(trials)))
+                candidates = [{name: _json_value(value) for name, value in zip(names, point)} for point in points]
+                scores = parallel(delayed(_fit_and_score)(pipeline, params, X, y, train, test, scoring)
+                                  for params in candidates for train, test in folds)
+                scores = np.asarray(scores).reshape(len(candidates), len(folds)).mean(axis=1)
+                optimizer.tell(points, [-float(score) for score in scores])
+                seconds = (time.perf_counter() - batch_start) / len(candidates)
+                trials += [{'params': params, 'score': float(score), 'seconds': seconds}
+                           for params, score in zip(candidates, scores)]
+                if checkpoint_path is not None:
+                    save_checkpoint(checkpoint_path, names, trials, fingerprint)
+
+    return SearchResult(trials, time.perf_counter() - start, n_parallel, threads_per_fit, resumed)
+
+
+def fit_best(X, y, params, k=10, n_threads=None, random_state=42):
+    """
+    The pipeline with `params`, fitted on (X, y) with all `n_threads` threads.
+    """
+    return make_pipeline(k, n_threads or os.cpu_count() or 1, random_state=random_state).set_params(**params).fit(X, y)
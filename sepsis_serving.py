@@ -0,0 +1,92 @@
+"""
+Low-latency online scoring for a fitted SepsisPredictor.
+
+`MicroBatcher` scores, as one batch, every request that queued up while the previous batch was being scored
+(up to `max_batch`, optionally lingering `max_wait` seconds for more), so batches grow with load while a lone
+request is scored immediately. Requests are encoded into a preallocated float32 matrix with the predictor's lookup
+tables and each batch is scored with a single booster call. With rolling features, each request is a new record of
+its patient and updates the predictor's feature engine, in queue order. Each request gets back a future resolving to
+{"probability": ..., "verdict": ...}.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+_STOP = object()
+
+
+class MicroBatcher:
+    def __init__(self, predictor, max_batch=256, max_wait=0.0):
+        self.predictor = predictor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._buffer = np.empty((max_batch, len(predictor.selected_features)), dtype=np.float32)
+        self._requests = queue.SimpleQueue()
+        self._worker = threading.Thread(target=self._run, name='sepsis-micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, patient_data):
+        """
+        Queue one patient for scoring and return a Future of its score.
+        """
+        future = Future()
+        self._requests.put((patient_data, future))
+        return future
+
+    def score(self, patient_data, timeout=None):
+        return self.submit(patient_data).result(timeout)
+
+    async def score_async(self, patient_data):
+        return await asyncio.wrap_future(self.submit(patient_data))
+
+    def close(self):
+        self._requests.put(_STOP)
+        self._worker.join()
+
+    def _collect(self):
+        # Block for the first request, then take whatever else is queued until the batch is full or `max_wait` has passed
+        batch = [self._requests.get()]
+        if batch[0] is _STOP:
+            return None
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is _STOP:
+                self._requests.put(_STOP)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            futures, rows = [], 0
+            for patient_data, future in batch:
+                try:
+                    patient_data = self.predictor.add_rolling_features(patient_data)
+                    self.predictor.encode_patient(patient_data, self._buffer[rows])
+                except Exception as error:
+                    future.set_exception(error)
+                    continue
+                futures.append(future)
+                rows += 1
+            if not rows:
+                continue
+            try:
+                probabilities = self.predictor.predict_proba_matrix(self._buffer[:rows])
+            except Exception as error:
+                for future in futures:
+                    future.set_exception(error)
+                continue
+            for future, probability in zip(futures, probabilities.tolist()):
+                future.set_result({"probability": probability, "verdict": self.predictor.verdict(probability)})
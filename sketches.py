@@ -0,0 +1,112 @@
+"""
+Mergeable sketches for chunked data quality checks.
+"""
+import numpy as np
+import pandas as pd
+
+
+def hash_values(values):
+    """
+    64-bit hashes of a column's values. Numeric columns are hashed as float64 so that a column
+    read as int in one chunk and as float in another (because of missing values) hashes the same.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return pd.util.hash_array(values.to_numpy(dtype=np.float64, na_value=np.nan))
+    return pd.util.hash_array(values.to_numpy(dtype=object))
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count sketch with 2 ** `precision` one-byte registers.
+    The relative standard error is about 1.04 / sqrt(2 ** precision), 0.8% for the default precision.
+    """
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return
+        width = 64 - self.precision
+        index = (hashes >> np.uint64(width)).astype(np.intp)
+        remainder = hashes & np.uint64((1 << width) - 1)
+        # Position of the leftmost 1-bit in the remaining bits; exact since remainder < 2 ** 53
+        bit_length = np.frexp(remainder.astype(np.float64))[1]
+        rank = (width + 1 - bit_length).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def add(self, values):
+        self.add_hashes(hash_values(values))
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting for small cardinalities
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+def _sorted_unique(hashes):
+    # np.unique without its generic (and, for large arrays, much slower) code path: sort, then drop repeats
+    hashes = np.sort(hashes, kind='stable')
+    if len(hashes) > 1:
+        hashes = hashes[np.concatenate(([True], hashes[1:] != hashes[:-1]))]
+    return hashes
+
+
+class HashSet:
+    """
+    Exact distinct count over 64-bit value hashes, merged chunk by chunk.
+    Memory grows with the number of distinct values rather than the number of rows.
+
+    Hashes are kept in sorted runs of decreasing size. A new chunk is merged only with runs no larger than itself
+    (like a binary counter), so there are at most log2(distinct values) runs and each hash is re-sorted O(log n)
+    times, instead of the whole set being re-sorted for every chunk.
+    """
+    def __init__(self):
+        self._runs = []
+
+    @property
+    def hashes(self):
+        # All hashes as one sorted array
+        if len(self._runs) != 1:
+            self._runs = [_sorted_unique(np.concatenate(self._runs)) if self._runs else np.empty(0, dtype=np.uint64)]
+        return self._runs[0]
+
+    def add_hashes(self, hashes):
+        run = _sorted_unique(np.asarray(hashes, dtype=np.uint64))
+        while self._runs and len(self._runs[-1]) <= len(run):
+            run = _sorted_unique(np.concatenate((self._runs.pop(), run)))
+        self._runs.append(run)
+
+    def contains(self, hashes):
+        """
+        Boolean array: which of `hashes` are already in the set.
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        found = np.zeros(len(hashes), dtype=bool)
+        for run in self._runs:
+            if len(run):
+                found |= run[np.searchsorted(run, hashes).clip(max=len(run) - 1)] == hashes
+        return found
+
+    def add(self, values):
+        self.add_hashes(hash_values(values))
+
+    def merge(self, other):
+        self.add_hashes(other.hashes)
+        return self
+
+    def count(self):
+        return len(self.hashes)
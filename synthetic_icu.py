@@ -0,0 +1,231 @@
+"""
+Synthetic ICU data for the scripts and benchmarks, in place of the patient files we cannot share.
+
+`make_icu_table(n_rows)` returns a table of hourly ICU observations: `rows_per_patient` rows per patient with a
+patient, hospital and admission id, a timestamp, every column of `SepsisPredictor.selected_features`, the fields the
+`icudguide` protocols read, `n_extra_columns` extra lab columns and a `sepsis` label drawn from a risk model of the
+SIRS criteria, lactate, blood pressure and cultures. Vitals and labs vary around a per-patient baseline, and measured
+columns are missing at `missing_rate`.
+
+Rows are generated in chunks of whole patients, each from its own seeded generator, so a table is reproducible from
+(n_rows, seed) and `write_dataset` can write files of any size in bounded memory. `DATASETS` shapes the table into
+the file each entry point reads (`sepsis_data.csv` for predict.py, `icu_patient_data.csv` for predict_sepsis.py,
+`Suicide data.csv` for dqc.py, `data.csv` for the REST ingestion script and `dq_upload.csv` for the data quality API);
+`make_dataset` returns the same shapes as DataFrames, for the benchmarks.
+
+Usage:
+    python synthetic_icu.py output_dir [--rows 1000000] [--extra-columns 0] [--seed 42] [--datasets sepsis_data.csv ...]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+CHUNK_SIZE = 240_000
+ROWS_PER_PATIENT = 24
+N_HOSPITALS = 20
+START = pd.Timestamp('2024-01-01')
+# Reference date of the data quality upload: the end of the year of admissions
+UPLOAD_DATE = START + pd.Timedelta(days=365)
+
+CATEGORIES = {'gender': ['Female', 'Male'], 'ventilator': ['No', 'Yes'], 'central_line': ['No', 'Yes'],
+              'urinary_catheter': ['No', 'Yes']}
+# Probability of the second category of each categorical column
+CATEGORY_RATES = {'gender': 0.56, 'ventilator': 0.35, 'central_line': 0.5, 'urinary_catheter': 0.6}
+CULTURE_RATE = 0.15
+WARDS = ['MICU', 'SICU', 'CCU', 'NICU']
+
+# {column: (mean, patient sd, row sd, low, high, decimals)} of the normally distributed measurements
+MEASUREMENTS = {
+    'heart_rate': (88, 14, 8, 30, 200, 0),
+    'respiratory_rate': (19, 4, 3, 6, 50, 0),
+    'systolic_bp': (118, 18, 10, 50, 230, 0),
+    'diastolic_bp': (64, 10, 7, 25, 130, 0),
+    'spo2': (96, 2, 1.5, 70, 100, 0),
+    'temperature': (37.1, 0.6, 0.4, 33.0, 41.5, 1),
+    'urine_output': (1500, 500, 300, 0, 5000, 0),
+    'wbc_count': (9500, 3500, 1500, 300, 40000, 0),
+    'platelet_count': (230000, 80000, 20000, 5000, 800000, 0),
+    'glucose': (140, 35, 25, 40, 600, 0),
+    'sodium': (139, 3, 2, 115, 165, 0),
+    'potassium': (4.1, 0.5, 0.3, 2.0, 7.5, 2),
+    'creatinine': (1.1, 0.5, 0.15, 0.2, 10.0, 2),
+    'bun': (22, 10, 4, 2, 150, 0),
+    'lactate': (1.8, 0.9, 0.5, 0.3, 15.0, 1),
+    'albumin': (3.2, 0.5, 0.2, 1.0, 5.5, 1),
+    'bnp': (300, 250, 80, 5, 5000, 0),
+    'pao2': (90, 18, 12, 40, 400, 0),
+    'pco2': (40, 5, 4, 15, 100, 0),
+    'ph': (7.38, 0.05, 0.03, 6.8, 7.7, 2),
+    'bicarbonate': (24, 3, 2, 5, 45, 0),
+    'weight': (80, 18, 0.5, 35, 200, 1),
+    'peak_pressure': (25, 5, 3, 8, 60, 0),
+}
+
+
+def _patient_columns(rng, n_patients, first_patient):
+    patients = pd.DataFrame({
+        'patient_id': np.arange(first_patient, first_patient + n_patients),
+        'hospital_id': rng.integers(0, N_HOSPITALS, n_patients),
+        'age': np.clip(rng.normal(64, 16, n_patients), 18, 100).round().astype(np.int64),
+        'ward': pd.Categorical.from_codes(rng.integers(0, len(WARDS), n_patients), WARDS),
+    })
+    patients['admission_id'] = patients['patient_id'] + 10 ** 7
+    patients['admitted_at'] = START + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, n_patients), unit='min')
+    for column, categories in CATEGORIES.items():
+        patients[column] = pd.Categorical.from_codes((rng.random(n_patients) < CATEGORY_RATES[column]).astype(np.int8),
+                                                     categories)
+    return patients
+
+
+def _chunk(n_rows, seed, chunk_index, first_patient, n_extra_columns, missing_rate, rows_per_patient):
+    rng = np.random.default_rng([seed, chunk_index])
+    n_patients = -(-n_rows // rows_per_patient)
+    patients = _patient_columns(rng, n_patients, first_patient)
+    rows = np.repeat(np.arange(n_patients), rows_per_patient)[:n_rows]
+    hour = np.tile(np.arange(rows_per_patient), n_patients)[:n_rows]
+
+    table = patients.iloc[rows].reset_index(drop=True)
+    table['timestamp'] = (table.pop('admitted_at') + pd.to_timedelta(hour, unit='h')
+                          + pd.to_timedelta(rng.integers(0, 600, n_rows), unit='s'))
+    for column, (mean, patient_sd, row_sd, low, high, decimals) in MEASUREMENTS.items():
+        baseline = rng.normal(mean, patient_sd, n_patients)[rows]
+        table[column] = np.clip(baseline + rng.normal(0, row_sd, n_rows), low, high).round(decimals)
+    table['mean_bp'] = ((table['systolic_bp'] + 2 * table['diastolic_bp']) / 3).round()
+    table['white_blood_cells'] = table['wbc_count']
+    table['peep'] = rng.integers(5, 15, n_rows).astype(float)
+    table['pain_score'] = rng.integers(0, 11, n_rows).astype(float)
+    for column in ('blood_culture', 'urine_culture'):
+        table[column] = (rng.random(n_rows) < CULTURE_RATE).astype(np.int64)
+    for i in range(n_extra_columns):
+        table[f"lab_{i}"] = rng.lognormal(1.0, 0.6, n_rows).round(2)
+
+    # Sepsis risk from the SIRS criteria, lactate, hypotension and cultures (about one row in ten is positive)
+    sirs = (((table['temperature'] > 38.0) | (table['temperature'] < 36.0)).astype(int) + (table['heart_rate'] > 90)
+            + (table['respiratory_rate'] > 20) + ((table['wbc_count'] > 12000) | (table['wbc_count'] < 4000)))
+    logit = (-3.4 + 0.9 * (sirs >= 2) + 0.5 * (sirs >= 3) + 0.6 * (table['lactate'] - 2).clip(0, 4)
+             + 0.8 * (table['mean_bp'] < 65) + 0.7 * table['blood_culture'] + 0.3 * (table['ventilator'] == 'Yes')
+             + rng.normal(0, 0.6, n_rows))
+    table['sepsis'] = (rng.random(n_rows) < 1 / (1 + np.exp(-logit))).astype(np.int64)
+
+    measured = list(MEASUREMENTS) + ['mean_bp', 'white_blood_cells'] + [f"lab_{i}" for i in range(n_extra_columns)]
+    for column in measured:
+        values = table[column].to_numpy(copy=True)
+        values[rng.random(n_rows) < missing_rate] = np.nan
+        table[column] = values
+    return table
+
+
+def iter_icu_chunks(n_rows, n_extra_columns=0, missing_rate=0.02, seed=42, rows_per_patient=ROWS_PER_PATIENT):
+    """
+    `make_icu_table(n_rows)` in chunks of at most CHUNK_SIZE rows.
+    """
+    chunk_size = CHUNK_SIZE - CHUNK_SIZE % rows_per_patient
+    for chunk_index, start in enumerate(range(0, n_rows, chunk_size)):
+        yield _chunk(min(chunk_size, n_rows - start), seed, chunk_index, start // rows_per_patient, n_extra_columns,
+                     missing_rate, rows_per_patient)
+
+
+def make_icu_table(n_rows, n_extra_columns=0, missing_rate=0.02, seed=42, rows_per_patient=ROWS_PER_PATIENT):
+    """
+    Synthetic ICU observations with the columns described in the module docstring (string columns as categoricals).
+    """
+    chunks = list(iter_icu_chunks(n_rows, n_extra_columns, missing_rate, seed, rows_per_patient))
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def _encoded(table):
+    # Categorical columns as 0/1 codes, for the scripts that expect numeric features only
+    return table.assign(**{column: table[column].cat.codes.astype(np.int64) for column in CATEGORIES})
+
+
+def sepsis_data(table):
+    # predict.py: the ids, numeric features and the label last
+    features = [column for column in table.columns
+                if column not in ('patient_id', 'hospital_id', 'admission_id', 'timestamp', 'ward', 'sepsis')]
+    data = _encoded(table)[['patient_id', 'hospital_id', 'admission_id'] + features + ['sepsis']]
+    return data.rename(columns={'patient_id': 'PatientID', 'hospital_id': 'HospitalID', 'admission_id': 'AdmissionID'})
+
+
+def new_patient_data(table):
+    return sepsis_data(table).drop(columns='sepsis')
+
+
+def icu_patient_data(table):
+    # predict_sepsis.py: the observations with their label
+    return table
+
+
+def dqc_data(table):
+    # dqc.py profiles every column of any table
+    return table
+
+
+def ingestion_data(table):
+    # The REST ingestion script standardizes `column1`; `updated_at` is its incremental watermark column
+    data = _encoded(table).drop(columns='ward')
+    return data.assign(column1=data['heart_rate'], updated_at=data['timestamp'])
+
+
+def dq_upload(table):
+    # data_quality_control_fastapi: col1 in (0, 10) with 2 decimals, col2 with 3 decimals, and a date column in the
+    # 20 days before UPLOAD_DATE (fixed, so the file is the same on every run; the timeliness check then fails, which
+    # costs the same as passing)
+    return pd.DataFrame({'col1': table['potassium'], 'col2': (table['creatinine'] * 10 + 0.001).round(3),
+                         'col3': table['heart_rate'],
+                         'date_column': UPLOAD_DATE - pd.to_timedelta(table['patient_id'] % 20, unit='D')})
+
+
+DATASETS = {
+    'sepsis_data.csv': sepsis_data,
+    'new_patient_data.csv': new_patient_data,
+    'icu_patient_data.csv': icu_patient_data,
+    'Suicide data.csv': dqc_data,
+    'data.csv': ingestion_data,
+    'dq_upload.csv': dq_upload,
+}
+
+
+def make_dataset(dataset, n_rows, **options):
+    """
+    The `dataset` (a DATASETS key) shape of `make_icu_table(n_rows)` as a DataFrame, built chunk by chunk so the
+    full table is never held in memory. `options` are passed to `iter_icu_chunks`.
+    """
+    shape = DATASETS[dataset]
+    return pd.concat([shape(chunk) for chunk in iter_icu_chunks(n_rows, **options)], ignore_index=True)
+
+
+def write_dataset(path, n_rows, dataset=None, **options):
+    """
+    Write the `dataset` (a DATASETS key; default: the file name of `path`) shape of `make_icu_table(n_rows)` to a
+    CSV file, chunk by chunk. `options` are passed to `iter_icu_chunks`.
+    """
+    shape = DATASETS[dataset or os.path.basename(path)]
+    header = True
+    with open(path, 'w', newline='') as file:
+        for chunk in iter_icu_chunks(n_rows, **options):
+            shape(chunk).to_csv(file, index=False, header=header)
+            header = False
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('output_dir')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--extra-columns', type=int, default=0, help="extra lab columns, for wider tables")
+    parser.add_argument('--missing-rate', type=float, default=0.02)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--datasets', nargs='+', default=list(DATASETS), choices=list(DATASETS))
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for dataset in args.datasets:
+        path = write_dataset(os.path.join(args.output_dir, dataset), args.rows, n_extra_columns=args.extra_columns,
+                             missing_rate=args.missing_rate, seed=args.seed)
+        print(f"{path}: {args.rows} rows, {os.path.getsize(path) / 2 ** 20:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
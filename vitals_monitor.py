@@ -0,0 +1,151 @@
+"""
+Streaming evaluation of the sepsis (SIRS) and shock (MAP) protocols from icudguide.py.
+
+Bedside monitors send one signal at a time, so instead of re-running `sepsis_protocol` and
+`shock_protocol` on a full patient snapshot, `VitalsMonitor` keeps the latest value of every
+signal per patient in flat array-backed storage and, for each incoming event, recomputes only
+the criterion that signal feeds. A `Transition` is emitted only when a protocol's status changes.
+
+Statuses use the same integer codes as `icudguide.evaluate_protocols` (1 = alert, 0 = no alert),
+and a missing signal behaves like a NaN value in the scalar functions.
+"""
+import math
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+from icudguide import PROTOCOL_MESSAGES
+
+SIGNALS = ('temperature', 'heart_rate', 'respiratory_rate', 'white_blood_cells', 'systolic_bp', 'diastolic_bp')
+
+SEPSIS = 'sepsis'
+SHOCK = 'shock'
+
+_N_SIGNALS = len(SIGNALS)
+_SIGNAL_OFFSETS = {signal: offset for offset, signal in enumerate(SIGNALS)}
+_SYSTOLIC = _SIGNAL_OFFSETS['systolic_bp']
+_DIASTOLIC = _SIGNAL_OFFSETS['diastolic_bp']
+
+# SIRS score for every combination of the four criterion bits
+_SIRS_SCORE = bytes(bin(bits).count('1') for bits in range(16))
+
+_SEPSIS_BIT = 1
+_SHOCK_BIT = 2
+
+
+class Transition(namedtuple('Transition', 'patient_id protocol status value timestamp')):
+    """
+    A protocol status change for one patient. `value` is the SIRS score for sepsis and the MAP for shock.
+    """
+    __slots__ = ()
+
+    @property
+    def message(self):
+        return PROTOCOL_MESSAGES[self.protocol][self.status]
+
+
+class VitalsMonitor:
+    def __init__(self, capacity=1024):
+        self._slots = {}
+        self._patients = []
+        self._capacity = 0
+        self._values = array('d')
+        self._sirs_bits = bytearray()
+        self._status = bytearray()
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        extra = capacity - self._capacity
+        self._values.extend(array('d', [math.nan]) * (extra * _N_SIGNALS))
+        self._sirs_bits.extend(bytes(extra))
+        self._status.extend(bytes(extra))
+        self._capacity = capacity
+
+    def _slot(self, patient_id):
+        slot = len(self._patients)
+        if slot == self._capacity:
+            self._grow(max(1, 2 * self._capacity))
+        self._slots[patient_id] = slot
+        self._patients.append(patient_id)
+        return slot
+
+    def update(self, patient_id, signal, value, timestamp=None):
+        """
+        Apply one observation and return the list of transitions it caused.
+        """
+        return list(self.process([(patient_id, signal, value, timestamp)]))
+
+    def process(self, events):
+        """
+        Consume an iterable of (patient_id, signal, value, timestamp) events and yield a
+        `Transition` whenever the sepsis or shock status of a patient changes.
+        """
+        slots = self._slots
+        offsets = _SIGNAL_OFFSETS
+        sirs_score = _SIRS_SCORE
+        values = self._values
+        sirs_bits = self._sirs_bits
+        status = self._status
+
+        for patient_id, signal, value, timestamp in events:
+            slot = slots.get(patient_id)
+            if slot is None:
+                slot = self._slot(patient_id)
+            offset = offsets[signal]
+            base = slot * _N_SIGNALS
+            values[base + offset] = value
+
+            if offset < 4:
+                # SIRS criteria: temperature, heart rate, respiratory rate, white blood cells
+                if offset == 0:
+                    met = value > 38.0 or value < 36.0
+                elif offset == 1:
+                    met = value > 90
+                elif offset == 2:
+                    met = value > 20
+                else:
+                    met = value > 12000 or value < 4000
+                bit = 1 << offset
+                old_bits = sirs_bits[slot]
+                bits = (old_bits | bit) if met else (old_bits & ~bit)
+                if bits == old_bits:
+                    continue
+                sirs_bits[slot] = bits
+                score = sirs_score[bits]
+                suspected = score >= 2
+                old_status = status[slot]
+                if suspected != bool(old_status & _SEPSIS_BIT):
+                    status[slot] = old_status ^ _SEPSIS_BIT
+                    yield Transition(patient_id, SEPSIS, int(suspected), score, timestamp)
+            else:
+                # MAP from the latest systolic and diastolic pressures
+                mean_arterial_pressure = (2 * values[base + _DIASTOLIC] + values[base + _SYSTOLIC]) / 3
+                suspected = mean_arterial_pressure < 60
+                old_status = status[slot]
+                if suspected != bool(old_status & _SHOCK_BIT):
+                    status[slot] = old_status ^ _SHOCK_BIT
+                    yield Transition(patient_id, SHOCK, int(suspected), mean_arterial_pressure, timestamp)
+
+    async def aprocess(self, events):
+        """
+        Async counterpart of `process` for an async iterator of events.
+        """
+        async for event in events:
+            for transition in self.process((event,)):
+                yield transition
+
+    def status(self, patient_id):
+        """
+        Current {protocol: status code} for a patient.
+        """
+        state = self._status[self._slots[patient_id]]
+        return {SEPSIS: state & _SEPSIS_BIT, SHOCK: (state & _SHOCK_BIT) >> 1}
+
+    def snapshot(self):
+        """
+        (patients, latest signal values) copy of the store; columns follow SIGNALS.
+        """
+        n = len(self._patients)
+        values = np.frombuffer(self._values, dtype=np.float64, count=n * _N_SIGNALS).reshape(n, _N_SIGNALS)
+        return list(self._patients), values.copy()
@@ -0,0 +1,147 @@
+"""
+Bulk loading of dataframes into the data warehouse.
+
+- `get_engine` returns one shared, pooled SQLAlchemy engine per database URL instead of a new pool per load.
+- `load_dataframe` writes a dataframe in 'replace', 'append' or 'upsert' mode:
+  - on PostgreSQL rows are streamed with COPY FROM STDIN from an in-memory CSV buffer,
+    upserts go through a temporary table and INSERT ... ON CONFLICT DO UPDATE;
+  - on other dialects each batch of `batch_size` rows is sent as one executemany of a single-row INSERT (the
+    DBAPI driver loops over the rows, and SQLAlchemy's "insertmanyvalues" turns it into multi-row VALUES on drivers
+    that enable it), with the dialect's native upsert where available (SQLite, MySQL) and delete-then-insert
+    otherwise. On SQLite, sqlite3's executemany of a prepared statement measured faster than multi-row
+    INSERT ... VALUES statements built with SQLAlchemy (about 195k vs 9k rows/s).
+  The PostgreSQL COPY path has not been run against a live server; SQLite is the tested path.
+- Load latency, rows and the dataframe's in-memory size are recorded in the instrumentation metrics.
+"""
+import functools
+import io
+
+from sqlalchemy import Index, MetaData, Table, create_engine, delete, inspect, tuple_
+
+import instrumentation
+
+LOAD_MODES = ('replace', 'append', 'upsert')
+
+
+@functools.lru_cache(maxsize=None)
+def get_engine(database_url, pool_size=5, max_overflow=10):
+    """
+    Shared engine for `database_url`, created once per process.
+    """
+    if database_url.startswith('sqlite'):
+        return create_engine(database_url)
+    return create_engine(database_url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True)
+
+
+@instrumentation.timed('warehouse.load')
+def load_dataframe(df, table_name, engine, mode='append', key_columns=None, batch_size=10_000):
+    """
+    Load `df` into `table_name` in one transaction and return the number of rows written.
+    `key_columns` identify a row for mode='upsert'. Outside PostgreSQL rows are executed in batches of `batch_size`.
+    """
+    if mode not in LOAD_MODES:
+        raise ValueError(f"mode must be one of {LOAD_MODES}, got {mode!r}")
+    if mode == 'upsert' and not key_columns:
+        raise ValueError("key_columns are required for mode='upsert'")
+    if mode == 'upsert':
+        # The last row for a key wins, as with repeated upserts
+        df = df.drop_duplicates(subset=key_columns, keep='last')
+
+    with engine.begin() as conn:
+        # Create (or recreate) the table from the dataframe's schema without writing any rows
+        df.head(0).to_sql(table_name, conn, if_exists='replace' if mode == 'replace' else 'append', index=False)
+        if df.empty:
+            return 0
+        table = Table(table_name, MetaData(), autoload_with=conn)
+        if mode == 'upsert':
+            _ensure_unique_index(conn, table, key_columns)
+
+        if conn.dialect.name == 'postgresql':
+            if mode == 'upsert':
+                _copy_upsert(conn, df, table, key_columns)
+            else:
+                _copy_from_stdin(conn, df, table.name)
+        else:
+            for start in range(0, len(df), batch_size):
+                batch = df.iloc[start:start + batch_size]
+                if mode == 'upsert':
+                    _insert_upsert(conn, batch, table, key_columns)
+                else:
+                    conn.execute(table.insert(), _records(batch))
+    if instrumentation.is_enabled():
+        instrumentation.count_rows('warehouse.load', len(df))
+        instrumentation.count_bytes('warehouse.load', int(df.memory_usage(index=False).sum()), direction='out')
+    return len(df)
+
+
+def _records(df):
+    # Row dicts with NaN/NaT replaced by None so they bind as SQL NULL
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def _quote(conn, name):
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _ensure_unique_index(conn, table, key_columns):
+    index_name = f"ux_{table.name}_{'_'.join(key_columns)}"
+    existing = {index['name'] for index in inspect(conn).get_indexes(table.name)}
+    if index_name not in existing:
+        Index(index_name, *(table.c[column] for column in key_columns), unique=True).create(conn)
+
+
+def _copy_from_stdin(conn, df, table_name):
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    columns = ', '.join(_quote(conn, column) for column in df.columns)
+    statement = f"COPY {_quote(conn, table_name)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+    cursor = conn.connection.cursor()
+    if hasattr(cursor, 'copy_expert'):
+        # psycopg2
+        cursor.copy_expert(statement, buffer)
+    else:
+        # psycopg 3
+        with cursor.copy(statement) as copy:
+            copy.write(buffer.getvalue())
+
+
+def _copy_upsert(conn, df, table, key_columns):
+    staging_name = f"tmp_{table.name}_upsert"
+    conn.exec_driver_sql(
+        f"CREATE TEMP TABLE {_quote(conn, staging_name)} (LIKE {_quote(conn, table.name)} INCLUDING DEFAULTS) ON COMMIT DROP"
+    )
+    _copy_from_stdin(conn, df, staging_name)
+    columns = [_quote(conn, column) for column in df.columns]
+    keys = [_quote(conn, column) for column in key_columns]
+    updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in columns if column not in keys)
+    conflict_action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    conn.exec_driver_sql(
+        f"INSERT INTO {_quote(conn, table.name)} ({', '.join(columns)}) "
+        f"SELECT {', '.join(columns)} FROM {_quote(conn, staging_name)} "
+        f"ON CONFLICT ({', '.join(keys)}) {conflict_action}"
+    )
+
+
+def _insert_upsert(conn, df, table, key_columns):
+    records = _records(df)
+    dialect = conn.dialect.name
+    if dialect in ('sqlite', 'mysql', 'mariadb'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.mysql import insert
+        statement = insert(table)
+        updates = {column: statement.excluded[column] if dialect == 'sqlite' else statement.inserted[column]
+                   for column in df.columns if column not in key_columns}
+        if dialect == 'sqlite':
+            statement = (statement.on_conflict_do_update(index_elements=key_columns, set_=updates) if updates
+                         else statement.on_conflict_do_nothing(index_elements=key_columns))
+        else:
+            statement = statement.on_duplicate_key_update(**updates) if updates else statement.prefix_with('IGNORE')
+        conn.execute(statement, records)
+    else:
+        keys = list(df[key_columns].astype(object).itertuples(index=False, name=None))
+        key_clause = tuple_(*(table.c[column] for column in key_columns)).in_(keys)
+        conn.execute(delete(table).where(key_clause))
+        conn.execute(table.insert(), records)
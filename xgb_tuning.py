@@ -0,0 +1,211 @@
+"""
+CPU-first hyperparameter search for XGBoost classifiers.
+
+`tune` runs Bayesian optimization (bayes_opt) over a box of hyperparameters, evaluating each trial by K-fold
+cross-validation with early stopping on the validation fold:
+
+ - the folds are binned once into `QuantileDMatrix` objects (training and validation sharing the same cuts) and
+   reused by every trial, and all trees are grown with `tree_method='hist'`
+ - each trial trains its folds in rungs of `min_rounds * eta ** k` trees; a fold stops early once its validation
+   loss has not improved for `early_stopping_rounds` rounds
+ - after every rung a trial is pruned (asynchronous successive halving) unless its mean validation loss is in the
+   best 1 / `eta` of the trials that reached that rung
+ - `n_parallel` trials run at once on threads, each booster limited to `n_threads // n_parallel` threads so the
+   total never exceeds the thread budget
+
+The result records the trees actually trained next to the trees exhaustive CV (every trial's folds trained to its
+full `n_estimators`) would have trained.
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import xgboost as xgb
+from bayes_opt import BayesianOptimization
+from sklearn.model_selection import StratifiedKFold
+
+INTEGER_PARAMS = {'max_depth', 'n_estimators', 'max_delta_step', 'max_bin'}
+
+
+class CVFolds:
+    """
+    Stratified K-fold split of (X, y), binned once into reusable QuantileDMatrix objects.
+    """
+    def __init__(self, X, y, n_splits=5, max_bin=256, random_state=42):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        y = np.asarray(y)
+        self.max_bin = max_bin
+        self.folds = []
+        for train, valid in StratifiedKFold(n_splits, shuffle=True, random_state=random_state).split(X, y):
+            dtrain = xgb.QuantileDMatrix(X[train], y[train], max_bin=max_bin)
+            dvalid = xgb.QuantileDMatrix(X[valid], y[valid], ref=dtrain)
+            self.folds.append((dtrain, dvalid))
+
+    def __len__(self):
+        return len(self.folds)
+
+
+class FoldModel:
+    """
+    A booster grown on one fold a rung at a time, tracking its best validation loss for early stopping.
+    """
+    def __init__(self, params, dtrain, dvalid):
+        self.dtrain = dtrain
+        self.dvalid = dvalid
+        self.booster = xgb.Booster(params, [dtrain, dvalid])
+        self.rounds = 0
+        self.best_score = np.inf
+        self.best_iteration = -1
+        self.stopped = False
+
+    def train(self, until, early_stopping_rounds):
+        while self.rounds < until and not self.stopped:
+            self.booster.update(self.dtrain, self.rounds)
+            score = float(self.booster.eval_set([(self.dvalid, 'valid')], self.rounds).rsplit(':', 1)[1])
+            if score < self.best_score:
+                self.best_score, self.best_iteration = score, self.rounds
+            self.rounds += 1
+            self.stopped = self.rounds - 1 - self.best_iteration >= early_stopping_rounds
+        return self.best_score
+
+
+class Trial:
+    def __init__(self, number, params):
+        self.number = number
+        self.params = params
+        self.score = None
+        self.rungs = 0
+        self.pruned = False
+        self.trees = 0
+        self.best_iterations = []
+        self.seconds = 0.0
+
+    @property
+    def n_estimators(self):
+        # Trees to fit on the full training set: the mean early-stopped length across folds
+        return max(1, int(round(np.mean(self.best_iterations) + 1))) if self.best_iterations else self.params['n_estimators']
+
+    def to_dict(self):
+        return {'trial': self.number, 'score': self.score, 'rungs': self.rungs, 'pruned': self.pruned,
+                'trees': self.trees, 'n_estimators': self.n_estimators, 'seconds': self.seconds, **self.params}
+
+
+class TuningResult:
+    def __init__(self, trials, best, n_folds, seconds, n_parallel, threads_per_trial):
+        self.trials = trials
+        self.best = best
+        self.seconds = seconds
+        self.n_parallel = n_parallel
+        self.threads_per_trial = threads_per_trial
+        self.trees_trained = sum(trial.trees for trial in trials)
+        self.exhaustive_trees = sum(trial.params['n_estimators'] * n_folds for trial in trials)
+
+    @property
+    def best_params(self):
+        return {**self.best.params, 'n_estimators': self.best.n_estimators}
+
+    def summary(self):
+        pruned = sum(trial.pruned for trial in self.trials)
+        return (f"{len(self.trials)} trials ({pruned} pruned) in {self.seconds:.1f}s on {self.n_parallel} x "
+                f"{self.threads_per_trial} threads; trained {self.trees_trained} trees vs {self.exhaustive_trees} "
+                f"for exhaustive CV ({1 - self.trees_trained / max(self.exhaustive_trees, 1):.0%} fewer); "
+                f"best validation logloss {self.best.score:.4f}")
+
+
+def booster_params(params, max_bin, n_threads, random_state):
+    # Native booster parameters for a trial's sampled hyperparameters (n_estimators caps the rounds separately)
+    booster = {key: value for key, value in params.items() if key != 'n_estimators'}
+    booster.update(objective='binary:logistic', eval_metric='logloss', tree_method='hist', max_bin=max_bin,
+                   nthread=n_threads, seed=random_state, verbosity=0)
+    return booster
+
+
+def cast_params(params):
+    return {key: int(round(value)) if key in INTEGER_PARAMS else float(value) for key, value in params.items()}
+
+
+def _suggest(optimizer):
+    try:
+        return optimizer.suggest()
+    except TypeError:
+        # bayesian-optimization < 2 takes the acquisition (utility) function here
+        from bayes_opt import UtilityFunction
+        return optimizer.suggest(UtilityFunction(kind='ucb', kappa=2.576, xi=0.0))
+
+
+def tune(X, y, pbounds, n_iter=10, init_points=10, n_splits=5, min_rounds=50, eta=3, early_stopping_rounds=20,
+         n_threads=None, n_parallel=None, max_bin=256, random_state=42, folds=None):
+    """
+    Search `pbounds` ({name: (low, high)}, including 'n_estimators') for the hyperparameters with the lowest
+    cross-validated logloss, over `init_points` random and `n_iter` Bayesian trials.
+    `n_threads` (default: all cores) is split between `n_parallel` concurrent trials (default: one per 4 threads).
+    Returns a TuningResult.
+    """
+    start = time.perf_counter()
+    n_threads = n_threads or os.cpu_count() or 1
+    n_parallel = max(1, min(n_parallel or n_threads // 4 or 1, n_threads))
+    threads_per_trial = max(1, n_threads // n_parallel)
+    if folds is None:
+        folds = CVFolds(X, y, n_splits, max_bin, random_state)
+
+    optimizer = BayesianOptimization(f=None, pbounds=pbounds, random_state=random_state, verbose=0,
+                                     allow_duplicate_points=True)
+    rng = np.random.default_rng(random_state)
+    rung_scores = []
+    lock = threading.Lock()
+
+    def sample():
+        return {key: rng.uniform(low, high) for key, (low, high) in pbounds.items()}
+
+    def promote(trial, rung, score):
+        # Keep the trial if it is in the best 1 / eta of the trials that reached this rung so far
+        with lock:
+            if len(rung_scores) <= rung:
+                rung_scores.append([])
+            rung_scores[rung].append(score)
+            scores = sorted(rung_scores[rung])
+            return len(scores) < eta or score <= scores[max(len(scores) // eta - 1, 0)]
+
+    def run(trial):
+        trial_start = time.perf_counter()
+        params = booster_params(trial.params, folds.max_bin, threads_per_trial, random_state)
+        models = [FoldModel(params, dtrain, dvalid) for dtrain, dvalid in folds.folds]
+        budget = min_rounds
+        while True:
+            until = min(budget, trial.params['n_estimators'])
+            trial.score = float(np.mean([model.train(until, early_stopping_rounds) for model in models]))
+            trial.rungs += 1
+            finished = until == trial.params['n_estimators'] or all(model.stopped for model in models)
+            if finished:
+                break
+            if not promote(trial, trial.rungs - 1, trial.score):
+                trial.pruned = True
+                break
+            budget *= eta
+        trial.trees = sum(model.rounds for model in models)
+        trial.best_iterations = [model.best_iteration for model in models]
+        trial.seconds = time.perf_counter() - trial_start
+        return trial
+
+    trials = []
+    raw_params = {}
+    n_trials = init_points + n_iter
+    with ThreadPoolExecutor(max_workers=n_parallel) as executor:
+        pending = set()
+        while len(trials) < n_trials or pending:
+            while len(trials) < n_trials and len(pending) < n_parallel:
+                raw = sample() if len(trials) < init_points else _suggest(optimizer)
+                trial = Trial(len(trials), cast_params(raw))
+                raw_params[trial.number] = raw
+                trials.append(trial)
+                pending.add(executor.submit(run, trial))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                trial = future.result()
+                # Pruned trials are registered with their last (partial) score, which only overstates their loss
+                optimizer.register(params=raw_params[trial.number], target=-trial.score)
+
+    best = min(trials, key=lambda trial: (trial.pruned, trial.score))
+    return TuningResult(trials, best, len(folds), time.perf_counter() - start, n_parallel, threads_per_trial)